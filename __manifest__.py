@@ -23,7 +23,13 @@
             'views/libros_laborales.xml',
             'views/shift_wizard.xml',
             'views/hr_leave_liquidation_wizard.xml',
-            'security/ir.model.access.csv'],
+            'views/attendance_recompute_job_views.xml',
+            'views/late_mass_wizard_views.xml',
+            'views/attendance_anomaly_views.xml',
+            'views/attendance_coverage_views.xml',
+            'views/payslip_run_forecast_views.xml',
+            'security/ir.model.access.csv',
+            'data/hr_attendance_cron.xml'],
     "assets": {},
     "license": "LGPL-3",
     "installable": True,
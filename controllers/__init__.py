@@ -1 +1,3 @@
-from . import leave_portal
\ No newline at end of file
+from . import leave_portal
+from . import attendance_coverage
+from . import expected_shift
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from odoo import http, fields, _
+from odoo.exceptions import AccessError
+from odoo.http import request
+
+
+class AttendanceCoverage(http.Controller):
+
+    @http.route('/hr_attendance/coverage', type='json', auth='user')
+    def attendance_coverage(self, date_from, date_to, department_ids=None, **kw):
+        """Cobertura presentes/programados por departamento y hora, en JSON."""
+        if not request.env.user.has_group('hr_attendance.group_hr_attendance_officer'):
+            raise AccessError(_("Solo los responsables de asistencias pueden consultar la cobertura."))
+        coverage = request.env['hr.attendance.coverage.wizard']._get_coverage(
+            fields.Date.to_date(date_from),
+            fields.Date.to_date(date_to),
+            department_ids,
+        )
+        departments = request.env['hr.department'].browse({key[0] for key in coverage})
+        names = dict(zip(departments.ids, departments.mapped('display_name')))
+        return [
+            {
+                'department_id': department_id,
+                'department': names.get(department_id),
+                'bucket_start': fields.Datetime.to_string(bucket_start),
+                'present_hours': round(present_hours, 2),
+                'scheduled_hours': round(scheduled_hours, 2),
+            }
+            for (department_id, bucket_start), (present_hours, scheduled_hours) in sorted(coverage.items())
+        ]
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from odoo import http, fields
+from odoo.http import request
+from odoo.exceptions import UserError
+from datetime import timedelta
+
+from ..models.hr_employee import EXPECTED_SHIFT_MAX_DAYS
+
+
+class ExpectedShift(http.Controller):
+
+    def _get_expected_shift(self, employee, date_from=None, date_to=None):
+        try:
+            date_from = fields.Date.to_date(date_from) or fields.Date.context_today(employee)
+            date_to = fields.Date.to_date(date_to) or date_from + timedelta(days=1)
+        except (TypeError, ValueError):
+            return {'error': "Fechas inválidas."}
+        if date_to < date_from or (date_to - date_from).days >= EXPECTED_SHIFT_MAX_DAYS:
+            return {'error': "El rango debe tener entre 1 y %s días." % EXPECTED_SHIFT_MAX_DAYS}
+        return employee.sudo().get_expected_shift(date_from, date_to)
+
+    @http.route('/permisos/turno', type='json', auth='user')
+    def portal_expected_shift(self, date_from=None, date_to=None, **kw):
+        """Turnos esperados del empleado del usuario, para el portal de permisos."""
+        user = request.env.user
+        employee = user.employee_id
+        if not employee and user.partner_id.employee_ids:
+            employee = request.env['hr.employee'].sudo().search([
+                ('id', 'in', user.partner_id.employee_ids.ids),
+                ('active', '=', True)
+            ], limit=1)
+
+        if not employee:
+            raise UserError("No tiene un empleado asociado.")
+        return self._get_expected_shift(employee, date_from, date_to)
+
+    @http.route('/hr_attendance/<token>/expected_shift', type='json', auth='public')
+    def kiosk_expected_shift(self, token, employee_id, date_from=None, date_to=None, **kw):
+        """Turnos esperados de un empleado del kiosco identificado por ``token``."""
+        company = request.env['res.company'].sudo().search([('attendance_kiosk_key', '=', token)], limit=1)
+        if not company:
+            return []
+        try:
+            employee_id = int(employee_id)
+        except (TypeError, ValueError):
+            return {'error': "Empleado inválido."}
+        employee = request.env['hr.employee'].sudo().search([
+            ('id', '=', employee_id),
+            ('company_id', '=', company.id),
+        ], limit=1)
+        if not employee:
+            return []
+        return self._get_expected_shift(employee, date_from, date_to)
@@ -10,11 +10,20 @@ from . import res_company
 from . import time_off
 from . import salary_attachment
 from . import hr_payslip_run
+from . import hr_payslip_run_forecast
 from . import hr_allocations_wizard
 from . import hr_allocations_liquidation
 from . import hr_leave_allocation
 from . import hr_leave_allocation_liquidation_wizard
 from . import libros_laborales
 from . import hr_payroll_structure
+from . import hr_work_entry_type
 from . import hr_employee
-from . import hr_shift_change_wizard
\ No newline at end of file
+from . import hr_schedule_resolver
+from . import resource_calendar
+from . import hr_attendance_recompute_job
+from . import hr_attendance_anomaly
+from . import hr_attendance_overtime_counter
+from . import hr_attendance_coverage
+from . import hr_shift_change_wizard
+from . import hr_late_mass_wizard
\ No newline at end of file
@@ -1,19 +1,59 @@
 # -*- coding: utf-8 -*-
 
+from bisect import bisect_right
 from calendar import monthrange
 from collections import defaultdict
 from dateutil.relativedelta import relativedelta
 from operator import itemgetter
 from random import randint
-from odoo import models, fields, api
+from odoo import models, fields, api, tools, _
+from odoo.exceptions import UserError
 from datetime import datetime,time, timedelta
 import pytz
 from pytz import timezone, UTC
 import logging
 import math
+from time import perf_counter
+
+from .hr_contract import (
+    OVERTIME_DAY_FACTOR, OVERTIME_NIGHT_FACTOR, NIGHT_SURCHARGE_FACTOR, NIGHT_START_HOUR, NIGHT_END_HOUR,
+)
+from .resource_calendar import MINUTES_PER_DAY
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 _logger = logging.getLogger(__name__)
 
+# A partir de este tamaño de lote el recargo nocturno se calcula vectorizado
+NIGHT_HOURS_BULK_THRESHOLD = 200
+# Franjas nocturnas locales en segundos del día: 00:00-06:00 y 20:00-23:59:59
+NIGHT_BAND_EARLY_END = 6 * 3600
+NIGHT_BAND_LATE_START = 20 * 3600
+NIGHT_BAND_LATE_LENGTH = 4 * 3600 - 1
+NIGHT_SECONDS_PER_DAY = NIGHT_BAND_EARLY_END + NIGHT_BAND_LATE_LENGTH
+
+# Tamaño de lote por defecto para la carga masiva de marcaciones
+BULK_INGEST_CHUNK_SIZE = 2000
+
+# Marcación rápida: cálculos diferidos al proceso por lotes. Los demás campos
+# del pipeline de asistencia se agregan por compartir su cálculo.
+PENDING_COMPUTE_FIELDS = [
+    'scheduled_check_in',
+    'scheduled_check_out',
+    'work_day',
+    'night_hours',
+    'nocturno',
+    'overtime_hours',
+]
+PENDING_COMPUTE_BATCH_SIZE = 500
+PENDING_COMPUTE_DELAY = timedelta(seconds=5)
+
+# Campos cuyo cambio altera los acumulados de horas extra
+OVERTIME_COUNTER_FIELDS = {'employee_id', 'check_in', 'overtime_status', 'validated_overtime_hours', 'is_guard'}
+
 class HrContract(models.Model):
     _inherit = 'hr.attendance'
 
@@ -26,26 +66,26 @@ class HrContract(models.Model):
     # Campos derivados (solo lectura, calculados desde los originales)
     check_in_date = fields.Date(
         string="Fecha de Entrada",
-        compute='_compute_check_in_date',
+        compute='_compute_local_check_fields',
         store=True,
         tracking=True
     )
     check_in_time = fields.Char(
         string="Hora de Entrada",
-        compute='_compute_check_in_time',
+        compute='_compute_local_check_fields',
         store=True,
         tracking=True
     )
 
     check_out_date = fields.Date(
         string="Fecha de Salida",
-        compute='_compute_check_out_date',
+        compute='_compute_local_check_fields',
         store=True,
         tracking=True
     )
     check_out_time = fields.Char(
         string="Hora de salida",
-        compute='_compute_check_out_time',
+        compute='_compute_local_check_fields',
         store=True,
         tracking=True
     )
@@ -60,14 +100,18 @@ class HrContract(models.Model):
         tracking=True
     )
 
-    scheduled_check_in = fields.Datetime(string='Hora programada de entrada', compute='_compute_scheduled_attendance_times', store=True)
+    scheduled_check_in = fields.Datetime(string='Hora programada de entrada', compute='_compute_attendance_pipeline', store=True)
     scheduled_check_out = fields.Datetime(
         string='Hora programada de salida', 
-        compute='_compute_scheduled_attendance_times', 
+        compute='_compute_attendance_pipeline', 
         store=True
     )
-    late_minutes = fields.Float(string='Minutos de retraso', compute='_compute_late_minutes', store=True)
-    is_late = fields.Boolean(string='¿Llegó tarde?', compute='_compute_is_late', store=True)
+    # Día local del turno al que pertenece la marcación: filtro de periodos de nómina y reportes
+    work_day = fields.Date(string='Día de trabajo', compute='_compute_attendance_pipeline', store=True)
+    late_minutes = fields.Float(string='Minutos de retraso', compute='_compute_attendance_pipeline', store=True)
+    is_late = fields.Boolean(string='¿Llegó tarde?', compute='_compute_attendance_pipeline', store=True)
+    # overtime_day / overtime_night se asignan junto con overtime_hours
+    overtime_hours = fields.Float(compute='_compute_attendance_pipeline')
 
     late_status = fields.Selection([
     ('to_approve', 'Por aprobar'),
@@ -92,66 +136,147 @@ class HrContract(models.Model):
         store=True
     )
     currency_id = fields.Many2one('res.currency', default=lambda self: self.env.company.currency_id, readonly=True)
-    overtime_day_amount = fields.Monetary(string="Monto HED",compute='_compute_overtime_amount' ,store=False)
-    overtime_night_amount = fields.Monetary(string="Monto HEN",compute='_compute_overtime_amount', store=False)
+    overtime_day_amount = fields.Monetary(string="Monto HED",compute='_compute_overtime_amount' ,store=True)
+    overtime_night_amount = fields.Monetary(string="Monto HEN",compute='_compute_overtime_amount', store=True)
     night_hours_amount = fields.Monetary(
         string="Monto recargo nocturno",
         compute='_compute_overtime_amount',
-        store=False
+        store=True
     )
     total_overtime_amount = fields.Monetary(
         string="Total horas extra",
         compute='_compute_overtime_amount',
-        store=False
+        store=True
     )
     
     total_with_night_amount = fields.Monetary(
         string="Total con recargo nocturno",
         compute='_compute_overtime_amount',
-        store=False
+        store=True
     )
 
     out_of_schedule = fields.Boolean(
         string="Fuera de horario",
-        compute="_compute_out_of_schedule",
+        compute="_compute_attendance_pipeline",
         store=True,
         index=True,
     )
 
-    @api.depends(
-        "check_in",
-        "check_out",
-        "scheduled_check_in",
-        "scheduled_check_out",
+    # Clasificación para la nómina (hora local del empleado)
+    guard_day_hours = fields.Float(
+        string="Horas guardia diurna",
+        compute='_compute_payroll_hours',
+        store=True,
+        index=True,
+    )
+    guard_night_hours = fields.Float(
+        string="Horas guardia nocturna",
+        compute='_compute_payroll_hours',
+        store=True,
+        index=True,
+    )
+    approved_overtime_day = fields.Float(
+        string="Horas extra diurnas aprobadas",
+        compute='_compute_payroll_hours',
+        store=True,
+        index=True,
+    )
+    approved_overtime_night = fields.Float(
+        string="Horas extra nocturnas aprobadas",
+        compute='_compute_payroll_hours',
+        store=True,
+        index=True,
     )
-    def _compute_out_of_schedule(self):
-        limit = timedelta(hours=1)
 
-        for attendance in self:
-            attendance.out_of_schedule = False
+    overtime_cap_exceeded = fields.Boolean(
+        string="Supera máximo de horas extra",
+        compute='_compute_overtime_cap_exceeded',
+    )
+    overtime_remaining_info = fields.Char(
+        string="Horas extra disponibles",
+        compute='_compute_overtime_remaining_info',
+    )
 
-            if (
-                not attendance.check_in
-                or not attendance.check_out
-                or not attendance.scheduled_check_in
-                or not attendance.scheduled_check_out
-            ):
+    # Marcación rápida: horario, retrasos, horas extra y montos aún sin calcular
+    computation_pending = fields.Boolean(
+        string="Cálculo pendiente",
+        readonly=True,
+        copy=False,
+        index=True,
+    )
+
+    def init(self):
+        super().init()
+        # Consultas por periodo de nómina: empleado + día del turno
+        tools.create_index(
+            self._cr,
+            'hr_attendance_employee_work_day_index',
+            self._table,
+            ['employee_id', 'work_day'],
+        )
+
+    @api.depends(
+        'is_guard',
+        'worked_hours',
+        'check_in',
+        'check_out',
+        'employee_id',
+        'validated_overtime_hours',
+        'overtime_status',
+    )
+    def _compute_payroll_hours(self):
+        """
+        Guardias diurnas/nocturnas según la hora local de entrada y horas extra
+        aprobadas divididas en diurnas/nocturnas (se asumen al final de la
+        jornada). La nómina solo suma estos campos.
+        """
+        Contract = self.env['hr.contract']
+        timezones = {}
+        for att in self:
+            att.guard_day_hours = 0.0
+            att.guard_night_hours = 0.0
+            att.approved_overtime_day = 0.0
+            att.approved_overtime_night = 0.0
+            if not att.check_in:
                 continue
 
-            check_in_diff = abs(attendance.check_in - attendance.scheduled_check_in)
-            check_out_diff = abs(attendance.check_out - attendance.scheduled_check_out)
+            tz_name = att.employee_id.tz or 'America/Asuncion'
+            if tz_name not in timezones:
+                timezones[tz_name] = timezone(tz_name)
 
-            attendance.out_of_schedule = (
-                check_in_diff >= limit
-                and check_out_diff >= limit
-            )
-    
-    @api.depends('overtime_night','overtime_day','night_hours')
+            # === Guardia: horas trabajadas completas ===
+            if att.is_guard:
+                if att.worked_hours <= 0:
+                    continue
+                hour_in = UTC.localize(att.check_in).astimezone(timezones[tz_name]).hour
+                if hour_in >= NIGHT_START_HOUR or hour_in < NIGHT_END_HOUR:
+                    att.guard_night_hours = att.worked_hours
+                else:
+                    att.guard_day_hours = att.worked_hours
+
+            # === Hora extra aprobada (y no es guardia) ===
+            elif att.check_out and att.validated_overtime_hours > 0 and att.overtime_status == 'approved':
+                overtime_end = UTC.localize(att.check_out)
+                overtime_start = overtime_end - timedelta(hours=att.validated_overtime_hours)
+                night_overtime = Contract._get_night_hours_between(
+                    overtime_start,
+                    overtime_end,
+                    night_start=NIGHT_START_HOUR,
+                    night_end=NIGHT_END_HOUR,
+                    tz_name=tz_name,
+                )
+                att.approved_overtime_night = night_overtime
+                att.approved_overtime_day = max(0.0, att.validated_overtime_hours - night_overtime)
+
+    # El salario no figura en las dependencias para no recalcular todo el
+    # historial: hr.contract.write recalcula solo los periodos sin pagar.
+    @api.depends('overtime_night','overtime_day','night_hours','employee_id','check_in')
     def _compute_overtime_amount(self):
+        hourly_rates = self._get_contract_hourly_rates()
         for att in self:
-            contract = att.employee_id.contract_id
+            hourly_rate = hourly_rates.get(att, 0.0)
             
-            if not contract or not contract.wage:
+            if not hourly_rate:
                 att.overtime_day_amount = 0
                 att.overtime_night_amount = 0
                 att.night_hours_amount = 0
@@ -159,21 +284,17 @@ class HrContract(models.Model):
                 att.total_with_night_amount = 0
                 continue
             
-            # 🔹 Valor hora (ajustable)
-            hours_per_day = 8
-            hourly_rate = contract.wage / 30 / hours_per_day
-            
             # 🔹 Horas
             day_hours = att.overtime_day or 0
             night_hours_ot = att.overtime_night or 0
             night_hours = att.night_hours or 0
             
             # 🔹 Cálculo
-            day_rate = hourly_rate * 1.5
-            night_rate = hourly_rate * 2.0
+            day_rate = hourly_rate * OVERTIME_DAY_FACTOR
+            night_rate = hourly_rate * OVERTIME_NIGHT_FACTOR
             day_amount = day_rate * day_hours
             night_ot_amount = night_rate * night_hours_ot
-            night_extra_amount = hourly_rate * 0.30 * night_hours
+            night_extra_amount = hourly_rate * NIGHT_SURCHARGE_FACTOR * night_hours
             
             att.overtime_day_amount = day_amount
             att.overtime_night_amount = night_ot_amount
@@ -182,8 +303,53 @@ class HrContract(models.Model):
             att.total_overtime_amount = day_amount + night_ot_amount
             att.total_with_night_amount = att.total_overtime_amount + night_extra_amount
 
+    @api.model
+    def _get_overtime_amount_fields(self):
+        return [
+            'overtime_day_amount',
+            'overtime_night_amount',
+            'night_hours_amount',
+            'total_overtime_amount',
+            'total_with_night_amount',
+        ]
+
+    def _get_contract_hourly_rates(self):
+        """
+        Valor hora de cada asistencia según el contrato vigente en su check_in
+        (o el contrato actual del empleado). El valor se resuelve una sola vez
+        por contrato en todo el lote.
+        """
+        resolver = self.env['hr.schedule.resolver']
+        resolver._get_timelines(self.employee_id.ids)
+
+        contract_by_attendance = {}
+        for att in self:
+            if not att.employee_id:
+                continue
+            contract_id = False
+            if att.check_in:
+                period = resolver._get_contract_at(att.employee_id.id, att.check_in)
+                contract_id = period.res_id if period else False
+            contract_by_attendance[att] = contract_id or att.employee_id.contract_id.id
+
+        contracts = self.env['hr.contract'].sudo().browse(set(filter(None, contract_by_attendance.values())))
+        rate_by_contract = {
+            contract.id: contract._get_attendance_hourly_rate() if contract.wage else 0.0
+            for contract in contracts
+        }
+        return {
+            att: rate_by_contract.get(contract_id, 0.0)
+            for att, contract_id in contract_by_attendance.items()
+        }
+
     @api.depends('check_in', 'check_out')
     def _compute_night_hours(self):
+        computed = self.env['hr.attendance']
+        if np is not None and len(self) >= NIGHT_HOURS_BULK_THRESHOLD:
+            computed = self._compute_night_hours_bulk()
+        (self - computed)._compute_night_hours_single()
+
+    def _compute_night_hours_single(self):
     
         def overlap(start1, end1, start2, end2):
             start = max(start1, start2)
@@ -221,25 +387,114 @@ class HrContract(models.Model):
                 day += timedelta(days=1)
     
             att.night_hours = total_seconds / 3600.0
+
+    def _compute_night_hours_bulk(self):
+        """
+        Recargo nocturno vectorizado para lotes grandes.
+
+        Convierte check_in/check_out a segundos locales desde epoch y calcula el
+        solapamiento con las franjas nocturnas en forma cerrada: la diferencia
+        de la función acumulada de segundos nocturnos entre ambos extremos.
+        Solo resuelve las asistencias sin cambio de horario (DST) entre entrada
+        y salida; devuelve las asistencias calculadas y el resto queda para el
+        cálculo por registro, que da el mismo resultado al segundo.
+        """
+        computed = self.env['hr.attendance']
+        by_tz = defaultdict(list)
+        for att in self:
+            if att.check_in and att.check_out:
+                by_tz[att.employee_id.tz or 'America/Asuncion'].append(att)
+
+        for tz_name, atts in by_tz.items():
+            tz = pytz.timezone(tz_name)
+
+            check_in = np.array([att.check_in for att in atts], dtype='datetime64[s]').astype(np.int64)
+            check_out = np.array([att.check_out for att in atts], dtype='datetime64[s]').astype(np.int64)
+
+            in_index, in_offset = self._tz_offsets(tz, check_in)
+            out_index, out_offset = self._tz_offsets(tz, check_out)
+            same_offset = in_index == out_index
+
+            night_seconds = np.maximum(
+                self._night_seconds_until(check_out + out_offset)
+                - self._night_seconds_until(check_in + in_offset),
+                0,
+            )
+
+            for att, valid, seconds in zip(atts, same_offset.tolist(), night_seconds.tolist()):
+                if valid:
+                    att.night_hours = seconds / 3600.0
+                    computed |= att
+
+        # Sin entrada o salida: no hay recargo
+        empty = self.filtered(lambda a: not a.check_in or not a.check_out)
+        empty.night_hours = 0.0
+        return computed | empty
+
+    def _tz_offsets(self, tz, utc_seconds):
+        """
+        Devuelve (índice de transición, desfase en segundos) de ``tz`` para cada
+        instante UTC, con la misma búsqueda que hace pytz en ``fromutc``.
+        """
+        transitions = getattr(tz, '_utc_transition_times', None)
+        if not transitions:
+            offset = int(tz.utcoffset(datetime(2000, 1, 1)).total_seconds())
+            return np.zeros(utc_seconds.shape, dtype=np.int64), np.full(utc_seconds.shape, offset, dtype=np.int64)
+
+        transition_seconds = np.array(transitions, dtype='datetime64[s]').astype(np.int64)
+        offsets = np.array([int(info[0].total_seconds()) for info in tz._transition_info], dtype=np.int64)
+        index = np.maximum(np.searchsorted(transition_seconds, utc_seconds, side='right') - 1, 0)
+        return index, offsets[index]
+
+    def _night_seconds_until(self, local_seconds):
+        """Segundos nocturnos acumulados desde epoch hasta cada instante local."""
+        days = np.floor_divide(local_seconds, 86400)
+        seconds = local_seconds - days * 86400
+        return (
+            days * NIGHT_SECONDS_PER_DAY
+            + np.minimum(seconds, NIGHT_BAND_EARLY_END)
+            + np.clip(seconds - NIGHT_BAND_LATE_START, 0, NIGHT_BAND_LATE_LENGTH)
+        )
         
     @api.depends('check_in', 'employee_id')
     def _compute_shift_warnings(self):
-        for att in self:
-            att.warning_shift_pending = False
-    
-            if not att.employee_id or not att.check_in:
+        self.warning_shift_pending = False
+
+        attendances = self.filtered(lambda a: a.employee_id and a.check_in)
+        if not attendances:
+            return
+
+        # Una sola búsqueda para todos los empleados y el rango cubierto
+        check_ins = attendances.mapped('check_in')
+        leaves = self.env['hr.leave'].search_fetch([
+            ('employee_id', 'in', attendances.employee_id.ids),
+            ('holiday_status_id.shift_change', '=', True),
+            ('state', 'not in', ['validate', 'refuse']),
+            ('date_from', '<=', max(check_ins)),
+            ('date_to', '>=', min(check_ins)),
+        ], ['employee_id', 'date_from', 'date_to'])
+
+        # Índice de intervalos por empleado, ordenado por inicio
+        intervals_by_employee = defaultdict(list)
+        for leave in leaves:
+            intervals_by_employee[leave.employee_id.id].append((leave.date_from, leave.date_to))
+
+        index = {}
+        for employee_id, intervals in intervals_by_employee.items():
+            intervals.sort()
+            starts = [start for start, dummy in intervals]
+            max_ends = []
+            for dummy, end in intervals:
+                max_ends.append(max(end, max_ends[-1]) if max_ends else end)
+            index[employee_id] = (starts, max_ends)
+
+        for att in attendances:
+            if att.employee_id.id not in index:
                 continue
-    
-            leave = self.env['hr.leave'].search([
-                ('employee_id', '=', att.employee_id.id),
-                ('holiday_status_id.shift_change', '=', True),
-                ('state', 'not in', ['validate', 'refuse']),
-                ('date_from', '<=', att.check_in),
-                ('date_to', '>=', att.check_in),
-            ], limit=1)
-    
-            if leave:
-                att.warning_shift_pending = True
+            starts, max_ends = index[att.employee_id.id]
+            # Último permiso que empieza antes del check_in: ¿alguno llega a cubrirlo?
+            position = bisect_right(starts, att.check_in) - 1
+            att.warning_shift_pending = position >= 0 and max_ends[position] >= att.check_in
 
     @api.depends('late_minutes', 'late_status')
     def _compute_confirmed_late_minutes(self):
@@ -249,203 +504,346 @@ class HrContract(models.Model):
             else:
                 attendance.confirmed_late_minutes = 0.0
 
-    @api.depends('check_in', 'employee_id.shift_change_ids')
-    def _compute_scheduled_attendance_times(self):
-        for attendance in self:
-    
-            if not attendance.employee_id or not attendance.check_in:
-                attendance.scheduled_check_in = False
-                attendance.scheduled_check_out = False
-                continue
+    # Los cambios de turno no figuran en las dependencias: al aprobarse o
+    # cancelarse encolan un recálculo acotado a su rango de fechas.
+    @api.depends('check_in', 'check_out', 'employee_id')
+    def _compute_attendance_pipeline(self):
+        """
+        Evalúa en una sola pasada y en orden: horario programado, minutos de
+        retraso, llegada tarde, horas extra (diurnas/nocturnas) y fuera de
+        horario. Zona horaria, calendario y umbral se resuelven una vez por
+        empleado y cada campo se asigna con los valores ya calculados.
+
+        ``work_day`` se toma del turno programado para que las consultas por
+        periodo no dependan de la hora de la marcación.
+
+        ``confirmed_late_minutes`` queda aparte: depende también de la
+        aprobación y no debe volver a resolver el horario.
+        """
+        scheduled = self._get_scheduled_attendance_times()
+        skip_overtime = self.env.context.get('skip_overtime_compute')
+        out_of_schedule_limit = timedelta(hours=1)
+        employee_contexts = {}
+        fallback_atts = self.env['hr.attendance']
+
+        for att in self:
+            employee = att.employee_id
+            if employee not in employee_contexts:
+                employee_contexts[employee] = self._get_pipeline_context(employee)
+            employee_tz, calendar, calendar_tz, late_threshold = employee_contexts[employee]
+
+            # 1. Horario programado
+            scheduled_in, scheduled_out = scheduled.get(att, (False, False))
+            att.scheduled_check_in = scheduled_in
+            att.scheduled_check_out = scheduled_out
+            # Día del turno: fecha local de la entrada programada (un turno nocturno
+            # queda en el día en que empieza) o, sin horario, de la marcación
+            if att.check_in:
+                work_day_tz = employee_tz if employee.tz else calendar_tz
+                att.work_day = UTC.localize(scheduled_in or att.check_in).astimezone(work_day_tz).date()
+            else:
+                att.work_day = False
+
+            # 2. Retraso (en hora local)
+            late_minutes = 0.0
+            if scheduled_in and att.check_in:
+                scheduled_local = UTC.localize(scheduled_in).astimezone(employee_tz).replace(tzinfo=None)
+                check_in_local = UTC.localize(att.check_in).astimezone(employee_tz).replace(tzinfo=None)
+                late_minutes = max(0, (check_in_local - scheduled_local).total_seconds() / 60.0)
+            att.late_minutes = late_minutes
+            att.is_late = bool(employee) and late_minutes > late_threshold
+
+            # 3. Horas extra, con el retraso ya calculado
+            if not skip_overtime and not att._evaluate_overtime(calendar, calendar_tz):
+                fallback_atts |= att
+
+            # 4. Fuera de horario
+            att.out_of_schedule = bool(
+                att.check_in and att.check_out and scheduled_in and scheduled_out
+                and abs(att.check_in - scheduled_in) >= out_of_schedule_limit
+                and abs(att.check_out - scheduled_out) >= out_of_schedule_limit
+            )
+
+        # =========================
+        # 🔁 FALLBACK A ODOO
+        # =========================
+        if fallback_atts:
+            super(HrContract, fallback_atts)._compute_overtime_hours()
     
+            for att in fallback_atts:
+                if att.overtime_hours < 0:
+                    att.overtime_hours = 0.0
+
+        if not skip_overtime:
+            self.env['hr.attendance.overtime.counter']._mark_dirty(self._get_overtime_counter_keys())
+
+    @api.model
+    def _get_pipeline_context(self, employee):
+        """(zona del empleado, calendario, zona del calendario, umbral de tardanza)"""
+        company = employee.company_id or self.env.company
+        calendar = employee.resource_calendar_id
+        return (
+            timezone(employee.tz or 'UTC'),
+            calendar,
+            timezone(calendar.tz or 'UTC') if calendar else UTC,
+            company.attendance_late_threshold_minutes or 10,
+        )
+
+    def _get_scheduled_attendance_times(self):
+        """
+        Calcula en lote el horario programado de las asistencias.
+
+        Agrupa por empleado y calendario: el calendario vigente se resuelve con
+        ``hr.schedule.resolver`` y los intervalos de cada calendario se
+        obtienen con una única llamada a ``_cached_attendance_intervals_batch``
+        que cubre todo el rango de fechas y todos los recursos.
+
+        Devuelve ``{asistencia: (scheduled_check_in, scheduled_check_out)}``
+        en UTC naive; las asistencias sin horario no aparecen en el resultado.
+        """
+        attendances = self.filtered(lambda a: a.employee_id and a.check_in)
+        if not attendances:
+            return {}
+
+        resolver = self.env['hr.schedule.resolver']
+        resolver._get_timelines(attendances.employee_id.ids)
+
+        # Agrupar asistencias por calendario
+        requests_by_calendar = defaultdict(list)
+        for attendance in attendances:
             employee = attendance.employee_id
-    
-            # Obtener contrato vigente en la fecha
-            contract = self.env['hr.contract'].search([
-                ('employee_id', '=', employee.id),
-                ('state', '=', 'open'),
-                ('date_start', '<=', attendance.check_in.date()),
-                '|',
-                ('date_end', '=', False),
-                ('date_end', '>=', attendance.check_in.date())
-            ], limit=1)
-    
-            if not contract:
-                attendance.scheduled_check_in = False
-                attendance.scheduled_check_out = False
-                continue
-    
+
             # Zona horaria del empleado
             local_tz = timezone(employee.tz or 'America/Asuncion')
-    
+
             check_in_local = attendance.check_in.replace(tzinfo=UTC).astimezone(local_tz)
             check_date = check_in_local.date()
-    
+
             day_start = local_tz.localize(datetime.combine(check_date, time.min))
             day_end = day_start + timedelta(days=2)
-    
-            # Buscar cambio de turno aprobado
-            shift_change = self.env['hr.employee.shift.change'].search([
-                ('employee_id', '=', employee.id),
-                ('state', '=', 'approved'),
-            ], order='date_start desc', limit=10)
-    
-            shift_change = shift_change.filtered(
-                lambda s: s.date_start.date() <= check_date <= s.date_end.date()
-            )[:1]
-    
+
+            # Obtener contrato vigente en la fecha
+            contract = resolver._get_contract_at(employee.id, attendance.check_in, states=('open',))
+            if not contract:
+                continue
+
+            # Cambio de turno aprobado que cubra el día local de la marcación
+            shift_change = resolver._get_day_shift_change(employee.id, check_date)
+
             # ✅ Elegir calendario correcto
-            calendar = shift_change.calendar_id if shift_change else contract.resource_calendar_id
-    
-            if not calendar:
-                attendance.scheduled_check_in = False
-                attendance.scheduled_check_out = False
+            calendar_id = shift_change.calendar_id if shift_change else contract.calendar_id
+            if not calendar_id:
                 continue
-    
-            # Obtener intervalos del calendario elegido
-            intervals = calendar._attendance_intervals_batch(
-                day_start.astimezone(UTC),
-                day_end.astimezone(UTC),
-                employee.resource_id
-            ).get(employee.resource_id.id, [])
-    
-            candidates = []
-    
-            for interval in sorted(intervals, key=lambda x: x[0]):
-                start_local = interval[0].astimezone(local_tz)
-    
-                # eliminar intervalos antes de las 04:00 del mismo día
-                if (
-                    start_local.date() == check_date
-                    and start_local.hour < 4
-                ):
+            calendar = self.env['resource.calendar'].browse(calendar_id)
+
+            requests_by_calendar[calendar].append(
+                (attendance, local_tz, check_in_local, check_date, day_start, day_end)
+            )
+
+        result = {}
+        for calendar, requests in requests_by_calendar.items():
+            # Primero la tabla semanal compilada; los calendarios que no se
+            # pueden compilar usan los intervalos
+            tables = {}
+            pending = []
+            for request in requests:
+                tolerance = request[0].employee_id.company_id.attendance_shift_merge_tolerance
+                if tolerance not in tables:
+                    tables[tolerance] = calendar._get_shift_table(tolerance)
+                if tables[tolerance] is None:
+                    pending.append(request)
                     continue
-    
-                candidates.append(interval)
-    
-            if not candidates:
-                attendance.scheduled_check_in = False
-                attendance.scheduled_check_out = False
+                scheduled = self._match_shift_table(tables[tolerance], request[2], request[3], request[1])
+                if scheduled:
+                    result[request[0]] = scheduled
+            if not pending:
                 continue
-    
-            # Buscar intervalo correspondiente al check_in
-            closest_interval = None
-    
-            for interval in candidates:
-                start = interval[0]
-                end = interval[1]
-    
-                if start <= check_in_local <= end:
-                    closest_interval = interval
-                    break
-    
-            # fallback
-            if not closest_interval:
-                closest_interval = candidates[0]
-    
-            scheduled_in_local = closest_interval[0]
-    
-            # Calcular fin real del turno (unir bloques cercanos)
-            intervals_sorted = sorted(candidates, key=lambda x: x[0])
-    
-            shift_end = closest_interval[1]
-            prev_end = closest_interval[1]
-    
-            for interval in intervals_sorted:
-                start = interval[0]
-                end = interval[1]
-    
-                if start <= closest_interval[0]:
-                    continue
-    
-                gap_hours = (start - prev_end).total_seconds() / 3600
-    
-                # tolerancia para descansos o divisiones del calendario
-                if gap_hours <= 1.5:
-                    shift_end = end
-                    prev_end = end
-                    continue
-    
+
+            resources = self.env['resource.resource'].union(
+                *(request[0].employee_id.resource_id for request in pending)
+            )
+            span_start = min(request[4] for request in pending)
+            span_end = max(request[5] for request in pending)
+
+            # Una sola llamada por calendario para todo el rango (semanas en caché)
+            intervals_by_resource = calendar._cached_attendance_intervals_batch(
+                span_start.astimezone(UTC),
+                span_end.astimezone(UTC),
+                resources,
+            )
+
+            indexed = {}
+            for attendance, local_tz, check_in_local, check_date, day_start, day_end in pending:
+                resource_id = attendance.employee_id.resource_id.id
+                if resource_id not in indexed:
+                    items = sorted(intervals_by_resource.get(resource_id, []), key=lambda x: x[0])
+                    indexed[resource_id] = (items, [item[1] for item in items])
+                items, stops = indexed[resource_id]
+
+                # Intervalos dentro de la ventana de 2 días, recortados a ella
+                intervals = []
+                for interval in items[bisect_right(stops, day_start):]:
+                    if interval[0] >= day_end:
+                        break
+                    intervals.append((max(interval[0], day_start), min(interval[1], day_end)))
+
+                scheduled = self._match_scheduled_interval(
+                    check_in_local, check_date, local_tz, intervals,
+                    tolerance=attendance.employee_id.company_id.attendance_shift_merge_tolerance,
+                )
+                if scheduled:
+                    result[attendance] = scheduled
+
+        return result
+
+    def _match_shift_table(self, table, check_in_local, check_date, local_tz):
+        """
+        Igual que ``_match_scheduled_interval`` pero sobre la tabla semanal
+        compilada del calendario: una búsqueda binaria por marcación.
+        """
+        day_start = datetime.combine(check_date, time.min)
+        day_offset = check_date.weekday() * MINUTES_PER_DAY
+        minute = day_offset + (check_in_local.replace(tzinfo=None) - day_start).total_seconds() / 60
+        match = table.lookup(minute, day_offset)
+        if not match:
+            return None
+        return tuple(
+            local_tz.localize(day_start + timedelta(minutes=value - day_offset)).astimezone(UTC).replace(tzinfo=None)
+            for value in match
+        )
+
+    def _match_scheduled_interval(self, check_in_local, check_date, local_tz, intervals, tolerance=90):
+        """
+        Elige, entre los intervalos del calendario, el turno al que pertenece
+        la marcación y devuelve ``(entrada, salida)`` programadas en UTC naive.
+        """
+        candidates = []
+
+        for interval in sorted(intervals, key=lambda x: x[0]):
+            start_local = interval[0].astimezone(local_tz)
+
+            # eliminar intervalos antes de las 04:00 del mismo día
+            if (
+                start_local.date() == check_date
+                and start_local.hour < 4
+            ):
+                continue
+
+            candidates.append(interval)
+
+        if not candidates:
+            return None
+
+        # Buscar intervalo correspondiente al check_in
+        closest_interval = None
+
+        for interval in candidates:
+            start = interval[0]
+            end = interval[1]
+
+            if start <= check_in_local <= end:
+                closest_interval = interval
                 break
-    
-            attendance.scheduled_check_in = scheduled_in_local.astimezone(UTC).replace(tzinfo=None)
-            attendance.scheduled_check_out = shift_end.astimezone(UTC).replace(tzinfo=None)
 
-                
-    @api.depends('scheduled_check_in', 'check_in')
-    def _compute_late_minutes(self):
-        for attendance in self:
-            if attendance.scheduled_check_in and attendance.check_in:
-                # Convertir scheduled_check_in (almacenado como UTC naive) a zona local
-                local_tz = timezone(attendance.employee_id.tz or 'UTC')
-                scheduled_naive_utc = attendance.scheduled_check_in  # UTC naive
-                scheduled_local = scheduled_naive_utc.replace(tzinfo=UTC).astimezone(local_tz).replace(tzinfo=None)
-    
-                # Convertir check_in real a zona local
-                check_in_local = attendance.check_in.replace(tzinfo=UTC).astimezone(local_tz).replace(tzinfo=None)
-    
-                delta = check_in_local - scheduled_local
-                attendance.late_minutes = max(0, delta.total_seconds() / 60.0)
-            else:
-                attendance.late_minutes = 0.0
+        # fallback
+        if not closest_interval:
+            closest_interval = candidates[0]
 
-    @api.depends('late_minutes')
-    def _compute_is_late(self):
-        for attendance in self:
-            if not attendance.employee_id:
-                attendance.is_late = False
+        scheduled_in_local = closest_interval[0]
+
+        # Calcular fin real del turno (unir bloques cercanos)
+        shift_end = closest_interval[1]
+        prev_end = closest_interval[1]
+
+        for interval in candidates:
+            start = interval[0]
+            end = interval[1]
+
+            if start <= closest_interval[0]:
                 continue
-    
-            # Obtener el umbral de la compañía del empleado
-            company = attendance.employee_id.company_id or self.env.company
-            late_threshold = company.attendance_late_threshold_minutes or 10
-    
-            attendance.is_late = attendance.late_minutes > late_threshold
 
+            gap_minutes = (start - prev_end).total_seconds() / 60
+
+            # tolerancia para descansos o divisiones del calendario
+            if gap_minutes <= tolerance:
+                shift_end = end
+                prev_end = end
+                continue
+
+            break
+
+        return (
+            scheduled_in_local.astimezone(UTC).replace(tzinfo=None),
+            shift_end.astimezone(UTC).replace(tzinfo=None),
+        )
+
+                
     # -------------------------------
     # Métodos de cálculo (compute)
     # -------------------------------
 
-    @api.depends('check_in')
-    def _compute_check_in_date(self):
+    @api.depends('check_in', 'check_out', 'employee_id')
+    def _compute_local_check_fields(self):
+        """
+        Fecha y hora locales de entrada y salida, en la zona horaria del
+        empleado. Cada zona se resuelve una vez por lote y cada marca se
+        convierte una sola vez.
+        """
+        timezones = {}
         for record in self:
-            if record.check_in:
-                user_tz = pytz.timezone(self.env.user.tz or 'UTC')
-                check_in_local = pytz.UTC.localize(record.check_in).astimezone(user_tz)
-                record.check_in_date = check_in_local.date()
-            else:
-                record.check_in_date = False
+            tz_name = record.employee_id.tz or 'UTC'
+            if tz_name not in timezones:
+                timezones[tz_name] = pytz.timezone(tz_name)
+            tz = timezones[tz_name]
 
-    @api.depends('check_in')
-    def _compute_check_in_time(self):
-        for record in self:
             if record.check_in:
-                user_tz = pytz.timezone(self.env.user.tz or 'UTC')
-                check_in_local = pytz.UTC.localize(record.check_in).astimezone(user_tz)
+                check_in_local = pytz.UTC.localize(record.check_in).astimezone(tz)
+                record.check_in_date = check_in_local.date()
                 record.check_in_time = f"{check_in_local.hour:02d}:{check_in_local.minute:02d}"
             else:
-                record.check_in_time = False  # o "" si prefieres cadena vacía
+                record.check_in_date = False
+                record.check_in_time = False
 
-    @api.depends('check_out')
-    def _compute_check_out_date(self):
-        for record in self:
             if record.check_out:
-                user_tz = pytz.timezone(self.env.user.tz or 'UTC')
-                check_out_local = pytz.UTC.localize(record.check_out).astimezone(user_tz)
+                check_out_local = pytz.UTC.localize(record.check_out).astimezone(tz)
                 record.check_out_date = check_out_local.date()
-            else:
-                record.check_out_date = False
-
-    @api.depends('check_out')
-    def _compute_check_out_time(self):
-        for record in self:
-            if record.check_out:
-                user_tz = pytz.timezone(self.env.user.tz or 'UTC')
-                check_out_local = pytz.UTC.localize(record.check_out).astimezone(user_tz)
                 record.check_out_time = f"{check_out_local.hour:02d}:{check_out_local.minute:02d}"
             else:
+                record.check_out_date = False
                 record.check_out_time = False
 
+    @api.model
+    def _backfill_local_check_fields(self, attendance_ids=None):
+        """
+        Recalcula por SQL (``AT TIME ZONE``) las columnas de fecha y hora local
+        de toda la tabla, o solo de ``attendance_ids``. No genera seguimiento.
+        """
+        local_fields = ['check_in_date', 'check_in_time', 'check_out_date', 'check_out_time']
+        self.flush_model(['check_in', 'check_out', 'employee_id'] + local_fields)
+        query = """
+            UPDATE hr_attendance a
+               SET check_in_date = (a.check_in AT TIME ZONE 'UTC' AT TIME ZONE t.tz)::date,
+                   check_in_time = to_char(a.check_in AT TIME ZONE 'UTC' AT TIME ZONE t.tz, 'HH24:MI'),
+                   check_out_date = (a.check_out AT TIME ZONE 'UTC' AT TIME ZONE t.tz)::date,
+                   check_out_time = to_char(a.check_out AT TIME ZONE 'UTC' AT TIME ZONE t.tz, 'HH24:MI')
+              FROM (
+                    SELECT e.id AS employee_id, COALESCE(r.tz, 'UTC') AS tz
+                      FROM hr_employee e
+                      JOIN resource_resource r ON r.id = e.resource_id
+                   ) t
+             WHERE t.employee_id = a.employee_id
+        """
+        params = []
+        if attendance_ids is not None:
+            if not attendance_ids:
+                return 0
+            query += " AND a.id IN %s"
+            params.append(tuple(attendance_ids))
+        self.env.cr.execute(query, params)
+        updated = self.env.cr.rowcount
+        self.invalidate_model(local_fields)
+        _logger.info("Fechas y horas locales recalculadas por SQL: %s asistencias", updated)
+        return updated
 
     def _split_interval_day_night(self, start, end):
         total_day = 0.0
@@ -501,149 +899,112 @@ class HrContract(models.Model):
 
 
     def action_approve_late(self):
-        for attendance in self:
-            if attendance.late_status != 'to_approve':
-                continue
-            attendance.write({
-                'late_status': 'approved',
-            })
+        self.filtered(lambda attendance: attendance.late_status == 'to_approve').write({
+            'late_status': 'approved',
+        })
     
     def action_refuse_late(self):
-        for attendance in self:
-            if attendance.late_status != 'to_approve':
-                continue
-            attendance.write({
-                'late_status': 'refused',
-            })
+        self.filtered(lambda attendance: attendance.late_status == 'to_approve').write({
+            'late_status': 'refused',
+        })
 
 
-    @api.depends(
-        'check_in',
-        'check_out',
-        'employee_id',
-    )
-    def _compute_overtime_hours(self):
-        if self.env.context.get('skip_overtime_compute'):
-            return
-    
-        atts = self.filtered(lambda r: r._name == 'hr.attendance')
-        fallback_atts = self.env['hr.attendance']
+    def _evaluate_overtime(self, calendar, tz):
+        """
+        Horas extra diurnas/nocturnas de la asistencia respecto del horario
+        programado ya asignado. Devuelve False si corresponde el cálculo
+        estándar de Odoo.
+        """
+        att = self
+        att.overtime_hours = 0.0
     
-        for att in atts:
-            _logger.info(att.employee_id)
-            _logger.info(
-                "%s %s",
-                att.employee_id.name,
-                att.check_in
-            )
+        if not att.check_in or not att.check_out or not att.employee_id:
+            return False
+
+        # Si el horario es flexible, no hay horas extra
+        if calendar and calendar.flexible_hours:
+            att.overtime_day = 0.0
+            att.overtime_night = 0.0
             att.overtime_hours = 0.0
+            return True
+        
+        # ✅ usar horario ya calculado
+        if not att.scheduled_check_in or not att.scheduled_check_out:
+            return False
     
-            if not att.check_in or not att.check_out or not att.employee_id:
-                fallback_atts |= att
-                continue
-            employee = att.employee_id
-            calendar = employee.resource_calendar_id
-            if calendar and calendar.flexible_hours:
-                att.overtime_day = 0.0
-                att.overtime_night = 0.0
-                att.overtime_hours = 0.0
-                continue
-            
-            # ✅ usar horario ya calculado
-            if not att.scheduled_check_in or not att.scheduled_check_out:
-                fallback_atts |= att
-                continue
-    
-            # Si el horario es flexible, no hay horas extra
-    
-            tz = pytz.timezone(calendar.tz or 'UTC') if calendar else pytz.UTC
+        check_in = pytz.utc.localize(att.check_in).astimezone(tz)
+        check_out = pytz.utc.localize(att.check_out).astimezone(tz)
     
-            check_in = pytz.utc.localize(att.check_in).astimezone(tz)
-            check_out = pytz.utc.localize(att.check_out).astimezone(tz)
+        sched_in = pytz.utc.localize(att.scheduled_check_in).astimezone(tz)
+        sched_out = pytz.utc.localize(att.scheduled_check_out).astimezone(tz)
     
-            sched_in = pytz.utc.localize(att.scheduled_check_in).astimezone(tz)
-            sched_out = pytz.utc.localize(att.scheduled_check_out).astimezone(tz)
+        # 🔴 validar cercanía al turno
+        diff_hours = abs((check_in - sched_in).total_seconds() / 3600.0)
     
-            # 🔴 validar cercanía al turno
-            diff_hours = abs((check_in - sched_in).total_seconds() / 3600.0)
+        if diff_hours > 6:
+            return False
     
-            if diff_hours > 6:
-                fallback_atts |= att
-                continue
-    
-            # =========================
-            # ✅ TU LÓGICA CUSTOM
-            # =========================
+        # =========================
+        # ✅ TU LÓGICA CUSTOM
+        # =========================
     
-            grace_hours = 0.5
+        grace_hours = 0.5
     
-            extra_before = 0.0
-            extra_after = 0.0
+        extra_before = 0.0
+        extra_after = 0.0
     
-            # Entrada anticipada
-            entry_diff = (sched_in - check_in).total_seconds() / 3600.0
-            if entry_diff > grace_hours:
-                extra_before = entry_diff
+        # Entrada anticipada
+        entry_diff = (sched_in - check_in).total_seconds() / 3600.0
+        if entry_diff > grace_hours:
+            extra_before = entry_diff
     
-            # Salida tardía
-            exit_diff = (check_out - sched_out).total_seconds() / 3600.0
-            if exit_diff > grace_hours:
-                extra_after = exit_diff
-            day_hours = 0.0
-            night_hours = 0.0
+        # Salida tardía
+        exit_diff = (check_out - sched_out).total_seconds() / 3600.0
+        if exit_diff > grace_hours:
+            extra_after = exit_diff
+        day_hours = 0.0
+        night_hours = 0.0
 
-            # 🔹 Intervalo antes del turno
-            if extra_before > 0:
-                before_start = check_in
-                before_end = sched_in
-            
-                d, n = self._split_interval_day_night(before_start, before_end)
-                day_hours += d
-                night_hours += n
-            
-            # 🔹 Intervalo después del turno
-            if extra_after > 0:
-                after_start = sched_out
-                after_end = check_out
-            
-                d, n = self._split_interval_day_night(after_start, after_end)
-                day_hours += d
-                night_hours += n
+        # 🔹 Intervalo antes del turno
+        if extra_before > 0:
+            d, n = self._split_interval_day_night(check_in, sched_in)
+            day_hours += d
+            night_hours += n
+        
+        # 🔹 Intervalo después del turno
+        if extra_after > 0:
+            d, n = self._split_interval_day_night(sched_out, check_out)
+            day_hours += d
+            night_hours += n
 
-            att.overtime_day = round(day_hours, 2)
-            att.overtime_night = round(night_hours, 2)
+        overtime_day = round(day_hours, 2)
+        overtime_night = round(night_hours, 2)
 
-            # 🔹 Descuento por tardanza
-            late_hours = (att.late_minutes or 0.0) / 60.0
-            
+        # 🔹 Descuento por tardanza (ya calculada en esta pasada)
+        late_hours = (att.late_minutes or 0.0) / 60.0
+        
+        if late_hours > 0:
+            # Primero descontar de horas diurnas
+            if overtime_day >= late_hours:
+                overtime_day -= late_hours
+                late_hours = 0.0
+            else:
+                late_hours -= overtime_day
+                overtime_day = 0.0
+        
+            # Si todavía queda tardanza, descontar de nocturnas
             if late_hours > 0:
-                # Primero descontar de horas diurnas
-                if att.overtime_day >= late_hours:
-                    att.overtime_day -= late_hours
-                    late_hours = 0.0
+                if overtime_night >= late_hours:
+                    overtime_night -= late_hours
                 else:
-                    late_hours -= att.overtime_day
-                    att.overtime_day = 0.0
-            
-                # Si todavía queda tardanza, descontar de nocturnas
-                if late_hours > 0:
-                    if att.overtime_night >= late_hours:
-                        att.overtime_night -= late_hours
-                    else:
-                        att.overtime_night = 0.0
-            _logger.info(att.overtime_hours)
-            att.overtime_hours = att.overtime_day + att.overtime_night
-            if att.overtime_status == 'to_approve':
-                att.validated_overtime_hours = att.overtime_hours
-        # =========================
-        # 🔁 FALLBACK A ODOO
-        # =========================
-        if fallback_atts:
-            super(HrContract, fallback_atts)._compute_overtime_hours()
-    
-            for att in fallback_atts:
-                if att.overtime_hours < 0:
-                    att.overtime_hours = 0.0
+                    overtime_night = 0.0
+
+        att.overtime_day = overtime_day
+        att.overtime_night = overtime_night
+        att.overtime_hours = overtime_day + overtime_night
+        if att.overtime_status == 'to_approve':
+            att.validated_overtime_hours = att.overtime_hours
+        return True
 
     def _normalize_interval(self, interval):
         """
@@ -685,7 +1046,7 @@ class HrContract(models.Model):
         shift_start, shift_end = current
     
         # 🔹 Unir consecutivos
-        tolerance = timedelta(minutes=65)
+        tolerance = timedelta(minutes=att.employee_id.company_id.attendance_shift_merge_tolerance)
     
         for start, end in normalized:
             if start >= shift_end and (start - shift_end) <= tolerance:
@@ -693,13 +1054,287 @@ class HrContract(models.Model):
     
         return shift_start, shift_end
 
-    @api.depends('check_in', 'check_out','employee_id.shift_change_ids')
+    @api.depends('check_in', 'check_out')
     def _compute_worked_hours(self):
         """ Computes the worked hours of the attendance record.
             The worked hours of resource with flexible calendar is computed as the difference
-            between check_in and check_out, without taking into account the lunch_interval"""
-        for attendance in self:
-            if attendance.check_out and attendance.check_in and attendance.employee_id:
-                attendance.worked_hours = attendance._get_worked_hours_in_range(attendance.check_in, attendance.check_out)
-            else:
-                attendance.worked_hours = False
\ No newline at end of file
+            between check_in and check_out, without taking into account the lunch_interval.
+            Lunch intervals of the other records come from one batch call for all employees."""
+        closed = self.filtered(lambda a: a.check_out and a.check_in and a.employee_id)
+        (self - closed).worked_hours = False
+
+        # Horarios flexibles: cálculo estándar por asistencia
+        flexible = closed.filtered(
+            lambda a: (a.employee_id.resource_calendar_id or a.employee_id.company_id.resource_calendar_id).flexible_hours
+        )
+        for attendance in flexible:
+            attendance.worked_hours = attendance._get_worked_hours_in_range(attendance.check_in, attendance.check_out)
+
+        # Resto: almuerzos de todos los empleados del lote en una sola llamada
+        attendances = closed - flexible
+        if not attendances:
+            return
+        lunch_by_resource = attendances.employee_id._employee_attendance_intervals_batch(
+            UTC.localize(min(attendances.mapped('check_in'))),
+            UTC.localize(max(attendances.mapped('check_out'))),
+            lunch=True,
+        )
+        lunch_index = {
+            resource_id: ([start for start, dummy, dummy2 in intervals], [stop for dummy, stop, dummy2 in intervals])
+            for resource_id, intervals in lunch_by_resource.items()
+        }
+        for attendance in attendances:
+            check_in = UTC.localize(attendance.check_in)
+            check_out = UTC.localize(attendance.check_out)
+            lunch_seconds = 0.0
+            starts, stops = lunch_index.get(attendance.employee_id.resource_id.id, ([], []))
+            index = bisect_right(stops, check_in)
+            while index < len(starts) and starts[index] < check_out:
+                lunch_seconds += max((min(stops[index], check_out) - max(starts[index], check_in)).total_seconds(), 0)
+                index += 1
+            attendance.worked_hours = ((check_out - check_in).total_seconds() - lunch_seconds) / 3600.0
+
+    # -------------------------------
+    # Carga masiva
+    # -------------------------------
+
+    @api.model
+    def _bulk_ingest(self, vals_list, chunk_size=BULK_INGEST_CHUNK_SIZE, commit=True):
+        """
+        Carga masiva de marcaciones (relojes, archivos de importación).
+
+        Las filas se ordenan por empleado y entrada y se insertan por lotes sin
+        seguimiento ni mensajes de creación. Los campos calculados almacenados
+        (horario programado, retrasos, recargo nocturno, horas extra, fuera de
+        horario, fechas locales) quedan pendientes durante el alta y se evalúan
+        una sola vez para todo el lote en el flush, agrupados por empleado. Con
+        ``commit`` se confirma cada lote, de modo que un error solo descarta el
+        lote en curso.
+
+        Devuelve un resumen con la cantidad de filas, lotes y velocidad.
+        """
+        vals_list = sorted(vals_list, key=lambda vals: (
+            vals.get('employee_id') or 0,
+            str(vals.get('check_in') or ''),
+        ))
+        total = len(vals_list)
+        Attendance = self.with_context(
+            tracking_disable=True,
+            mail_create_nolog=True,
+            mail_notrack=True,
+        )
+
+        created_ids = []
+        started = perf_counter()
+        for offset in range(0, total, chunk_size):
+            chunk = vals_list[offset:offset + chunk_size]
+            records = Attendance.create(chunk)
+            # Evaluar todos los cálculos pendientes del lote de una vez
+            self.env.flush_all()
+            created_ids.extend(records.ids)
+            if commit:
+                self.env.cr.commit()
+
+            done = offset + len(chunk)
+            elapsed = perf_counter() - started
+            _logger.info(
+                "Carga masiva de asistencias: %s/%s filas (%.0f filas/s)",
+                done, total, done / elapsed if elapsed else 0.0,
+            )
+
+        elapsed = perf_counter() - started
+        return {
+            'created': len(created_ids),
+            'attendance_ids': created_ids,
+            'chunks': -(-total // chunk_size) if chunk_size else 0,
+            'seconds': round(elapsed, 2),
+            'rows_per_second': round(total / elapsed, 1) if elapsed else 0.0,
+        }
+
+    # -------------------------------
+    # Seguimiento de recálculos
+    # -------------------------------
+
+    def _compute_field_value(self, field):
+        # Las ediciones del usuario ya preparan el seguimiento en write(); los
+        # recálculos (trabajos, cargas, dependencias) solo generan mensajes
+        # por asistencia si la compañía del empleado lo pide, sin importar
+        # quién disparó el recálculo
+        if not field.store or self.env.context.get('mail_notrack'):
+            return super()._compute_field_value(field)
+        tracked = self.filtered(
+            lambda att: (att.employee_id.sudo().company_id or self.env.company).attendance_track_recomputes
+        )
+        if tracked:
+            super(HrContract, tracked)._compute_field_value(field)
+        untracked = self - tracked
+        if untracked:
+            super(HrContract, untracked.with_context(mail_notrack=True))._compute_field_value(field)
+
+    # -------------------------------
+    # Marcación rápida
+    # -------------------------------
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        if not self.env.context.get('attendance_fast_check_in'):
+            return super().create(vals_list)
+        for vals in vals_list:
+            vals['computation_pending'] = True
+        records = super().create(vals_list)
+        records._defer_pending_computations()
+        return records
+
+    def write(self, vals):
+        counter_keys = self._get_overtime_counter_keys() if OVERTIME_COUNTER_FIELDS.intersection(vals) else None
+        previous_approved = self._get_approved_overtime() if vals.get('overtime_status') == 'approved' else None
+        if self.env.context.get('attendance_fast_check_in') and {'check_in', 'check_out'}.intersection(vals):
+            res = super().write(dict(vals, computation_pending=True))
+            self._defer_pending_computations()
+        else:
+            res = super().write(vals)
+        if counter_keys is not None:
+            self.env['hr.attendance.overtime.counter']._mark_dirty(counter_keys | self._get_overtime_counter_keys())
+        if previous_approved is not None:
+            self._check_overtime_caps(previous_approved)
+        return res
+
+    def unlink(self):
+        counter_keys = self._get_overtime_counter_keys()
+        res = super().unlink()
+        self.env['hr.attendance.overtime.counter']._mark_dirty(counter_keys)
+        return res
+
+    def _update_overtime(self, *args, **kwargs):
+        # En la marcación rápida lo ejecuta el proceso de cálculos pendientes
+        if self.env.context.get('attendance_fast_check_in'):
+            return
+        return super()._update_overtime(*args, **kwargs)
+
+    def _defer_pending_computations(self):
+        """
+        Quita de la cola de cálculo los campos costosos (y sus dependientes) y
+        programa el proceso por lotes unos segundos después.
+        """
+        for field in self.env['hr.attendance.recompute.job']._get_fields_to_recompute(PENDING_COMPUTE_FIELDS):
+            self.env.remove_to_compute(field, self)
+        self.env.ref('hr_holiday_attendance_views.ir_cron_attendance_pending_computations')._trigger(
+            fields.Datetime.now() + PENDING_COMPUTE_DELAY
+        )
+
+    @api.model
+    def _cron_process_pending_computations(self, batch_size=PENDING_COMPUTE_BATCH_SIZE):
+        """
+        Completa los cálculos de las marcaciones rápidas, agrupadas por
+        empleado, confirmando cada lote.
+        """
+        Attendance = self.with_context(attendance_fast_check_in=False, mail_notrack=True)
+        fields_to_compute = self.env['hr.attendance.recompute.job']._get_fields_to_recompute(PENDING_COMPUTE_FIELDS)
+        while True:
+            attendances = Attendance.search(
+                [('computation_pending', '=', True)],
+                order='employee_id, check_in',
+                limit=batch_size,
+            )
+            if not attendances:
+                return
+            for field in fields_to_compute:
+                self.env.add_to_compute(field, attendances)
+            attendances._update_overtime()
+            attendances.write({'computation_pending': False})
+            Attendance.env.flush_all()
+            self.env.cr.commit()
+            if len(attendances) < batch_size:
+                return
+
+    # -------------------------------
+    # Máximos de horas extra
+    # -------------------------------
+
+    def _get_overtime_counter_keys(self):
+        Counter = self.env['hr.attendance.overtime.counter']
+        keys = set()
+        for att in self:
+            if att.employee_id and att.work_day:
+                keys.update(Counter._get_period_keys(att.employee_id.id, att.work_day))
+        return keys
+
+    @api.depends('overtime_hours', 'overtime_status', 'work_day', 'employee_id')
+    def _compute_overtime_cap_exceeded(self):
+        """
+        Supera el máximo si las horas aprobadas del día o de la semana, más las
+        de esta asistencia si aún están por aprobar, pasan el tope de la compañía.
+        """
+        Counter = self.env['hr.attendance.overtime.counter']
+        approved = Counter._get_approved_hours(self._get_overtime_counter_keys())
+        for att in self:
+            att.overtime_cap_exceeded = False
+            company = att.employee_id.company_id
+            if not att.employee_id or not att.work_day or company.overtime_cap_policy == 'none':
+                continue
+            pending = att.overtime_hours if att.overtime_status == 'to_approve' else 0.0
+            day_key, week_key = Counter._get_period_keys(att.employee_id.id, att.work_day)
+            att.overtime_cap_exceeded = bool(
+                (company.overtime_daily_cap and approved.get(day_key, 0.0) + pending > company.overtime_daily_cap)
+                or (company.overtime_weekly_cap and approved.get(week_key, 0.0) + pending > company.overtime_weekly_cap)
+            )
+
+    @api.depends('overtime_hours', 'work_day', 'employee_id')
+    def _compute_overtime_remaining_info(self):
+        for att in self:
+            att.overtime_remaining_info = False
+            if att.overtime_hours and att.employee_id and att.work_day:
+                att.overtime_remaining_info = att._format_remaining_overtime(
+                    att.employee_id._get_remaining_overtime(att.work_day)
+                )
+
+    @api.model
+    def _format_remaining_overtime(self, remaining):
+        parts = []
+        if remaining['day'] is not None:
+            parts.append(_("día %.2f h", remaining['day']))
+        if remaining['week'] is not None:
+            parts.append(_("semana %.2f h", remaining['week']))
+        return ", ".join(parts) or False
+
+    def _get_approved_overtime(self):
+        """``{asistencia: horas aprobadas}`` que cada una aporta a los acumulados."""
+        return {
+            att: att.approved_overtime_day + att.approved_overtime_night if att.overtime_status == 'approved' else 0.0
+            for att in self
+        }
+
+    def _check_overtime_caps(self, previous_approved):
+        Counter = self.env['hr.attendance.overtime.counter']
+        # Disponible antes de esta aprobación (acumulados aún sin actualizar)
+        remaining = {
+            att: att.employee_id._get_remaining_overtime(att.work_day)
+            for att in self
+            if att.employee_id and att.work_day and att.employee_id.company_id.overtime_cap_policy == 'block'
+        }
+        # Sumar a los acumulados del día y la semana solo la diferencia aprobada;
+        # el precommit vuelve a calcularlos desde las asistencias
+        deltas = defaultdict(float)
+        for att, hours in self._get_approved_overtime().items():
+            if att.employee_id and att.work_day:
+                for key in Counter._get_period_keys(att.employee_id.id, att.work_day):
+                    deltas[key] += hours - previous_approved.get(att, 0.0)
+        Counter._add_approved_hours(deltas)
+        self.invalidate_recordset(['overtime_cap_exceeded', 'overtime_remaining_info'])
+        blocked = self.filtered(
+            lambda att: att.overtime_cap_exceeded and att.employee_id.company_id.overtime_cap_policy == 'block'
+        )
+        if blocked:
+            raise UserError(_(
+                "Las horas extra aprobadas superan el máximo diario o semanal:\n%s",
+                "\n".join(
+                    _(
+                        "%(employee)s (%(day)s): %(hours).2f h solicitadas, disponible %(remaining)s",
+                        employee=att.employee_id.name,
+                        day=att.work_day,
+                        hours=att.overtime_hours,
+                        remaining=self._format_remaining_overtime(remaining[att]) or _("sin máximo"),
+                    )
+                    for att in blocked
+                ),
+            ))
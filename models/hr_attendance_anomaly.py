@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+from datetime import datetime, timedelta
+from time import perf_counter
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Parámetro con el write_date (UTC) hasta el que ya se revisaron las asistencias
+ANOMALY_LAST_SCAN_PARAM = 'hr_holiday_attendance_views.anomaly_last_scan'
+# Las transacciones confirmadas después de la revisión conservan un write_date
+# anterior: cada revisión vuelve a mirar este margen (el escaneo es idempotente)
+ANOMALY_SCAN_OVERLAP = timedelta(minutes=10)
+# Horas sin salida a partir de las cuales una asistencia abierta es anomalía
+ANOMALY_OPEN_HOURS = 16
+# Margen hacia atrás para comparar las nuevas marcaciones con las anteriores
+ANOMALY_OVERLAP_LOOKBACK = timedelta(days=2)
+
+
+class HrAttendanceAnomaly(models.Model):
+    _name = 'hr.attendance.anomaly'
+    _description = 'Anomalía de asistencia'
+    _order = 'date desc, id desc'
+
+    attendance_id = fields.Many2one('hr.attendance', string='Asistencia', required=True, ondelete='cascade', index=True)
+    employee_id = fields.Many2one('hr.employee', string='Empleado', required=True, index=True)
+    department_id = fields.Many2one('hr.department', string='Departamento', index=True)
+    company_id = fields.Many2one('res.company', string='Compañía', index=True)
+    date = fields.Date(string='Fecha', index=True)
+    check_in = fields.Datetime(related='attendance_id.check_in', string='Entrada')
+    check_out = fields.Datetime(related='attendance_id.check_out', string='Salida')
+    anomaly_type = fields.Selection([
+        ('open', 'Sin salida'),
+        ('overlap', 'Superpuesta'),
+        ('out_of_schedule', 'Fuera de horario'),
+        ('no_schedule', 'Sin turno programado'),
+    ], string='Tipo', required=True, index=True)
+    severity = fields.Selection([
+        ('low', 'Baja'),
+        ('medium', 'Media'),
+        ('high', 'Alta'),
+    ], string='Severidad', required=True, index=True)
+
+    _sql_constraints = [
+        ('attendance_type_unique', 'unique(attendance_id, anomaly_type)',
+         'La asistencia ya tiene una anomalía de este tipo.'),
+    ]
+
+    @api.model
+    def _cron_scan_anomalies(self):
+        """
+        Revisa las asistencias modificadas desde la última revisión (por
+        ``write_date``) con funciones de ventana (LAG/LEAD por empleado
+        ordenadas por entrada) y vuelve a revisar en cada ejecución las
+        asistencias abiertas. Las anomalías se insertan sin duplicar (una por
+        asistencia y tipo) y se eliminan las que ya no se cumplen.
+        """
+        started = perf_counter()
+        self.env['hr.attendance'].flush_model()
+        ICP = self.env['ir.config_parameter'].sudo()
+        last_scan = fields.Datetime.to_datetime(ICP.get_param(ANOMALY_LAST_SCAN_PARAM))
+        self.env.cr.execute("SELECT now() at time zone 'UTC'")
+        scan_until = self.env.cr.fetchone()[0]
+
+        since = last_scan - ANOMALY_SCAN_OVERLAP if last_scan else datetime.min
+        inserted, deleted = self._scan_changed_attendances(since, scan_until)
+        ICP.set_param(ANOMALY_LAST_SCAN_PARAM, fields.Datetime.to_string(scan_until))
+        inserted += self._scan_open_attendances()
+
+        _logger.info(
+            "Anomalías de asistencia: %s nuevas, %s resueltas (cambios desde %s) en %.2fs",
+            inserted, deleted, last_scan, perf_counter() - started,
+        )
+
+    def _scan_changed_attendances(self, since, until):
+        """
+        Superposiciones, fuera de horario y sin turno de las asistencias
+        modificadas en (since, until], sin las que tienen cálculos pendientes
+        (se revisan cuando el proceso por lotes las escribe). Las
+        superposiciones se evalúan también en las asistencias vecinas.
+        Devuelve ``(insertadas, eliminadas)``.
+        """
+        self.env.cr.execute("""
+            WITH changed AS (
+                SELECT id, employee_id, check_in
+                  FROM hr_attendance
+                 WHERE write_date > %(since)s
+                   AND write_date <= %(until)s
+                   AND NOT COALESCE(computation_pending, FALSE)
+            ), bounds AS (
+                SELECT employee_id, MIN(check_in) AS first_check_in, MAX(check_in) AS last_check_in
+                  FROM changed
+                 GROUP BY employee_id
+            ), scanned AS (
+                -- Ventana amplia para que LAG/LEAD de los vecinos también sean correctos
+                SELECT a.id, a.employee_id, a.check_in, a.check_out, a.work_day,
+                       a.out_of_schedule, a.scheduled_check_in,
+                       COALESCE(a.computation_pending, FALSE) AS computation_pending,
+                       a.check_in BETWEEN b.first_check_in - %(lookback)s AND b.last_check_in + %(lookback)s AS is_neighbour,
+                       LAG(a.check_out) OVER w AS prev_check_out,
+                       LEAD(a.check_in) OVER w AS next_check_in
+                  FROM hr_attendance a
+                  JOIN bounds b ON b.employee_id = a.employee_id
+                 WHERE a.check_in BETWEEN b.first_check_in - 2 * %(lookback)s AND b.last_check_in + 2 * %(lookback)s
+                WINDOW w AS (PARTITION BY a.employee_id ORDER BY a.check_in, a.id)
+            ), flags AS (
+                SELECT s.id, s.employee_id, s.work_day, t.anomaly_type, t.severity, t.flagged
+                  FROM scanned s
+                 CROSS JOIN LATERAL (VALUES
+                        ('overlap', 'high',
+                         COALESCE(s.prev_check_out > s.check_in
+                                  OR s.next_check_in < COALESCE(s.check_out, 'infinity'::timestamp), FALSE)),
+                        ('out_of_schedule', 'medium', COALESCE(s.out_of_schedule, FALSE)),
+                        ('no_schedule', 'low', s.scheduled_check_in IS NULL)
+                       ) AS t(anomaly_type, severity, flagged)
+                 WHERE (s.id IN (SELECT id FROM changed)
+                        OR (s.is_neighbour AND t.anomaly_type = 'overlap'))
+                   -- Sin día de trabajo todavía: se revisan cuando se completen sus cálculos
+                   AND NOT s.computation_pending
+            ), deleted AS (
+                DELETE FROM hr_attendance_anomaly x
+                 USING flags f
+                 WHERE x.attendance_id = f.id
+                   AND x.anomaly_type = f.anomaly_type
+                   AND NOT f.flagged
+                RETURNING x.id
+            ), inserted AS (
+                INSERT INTO hr_attendance_anomaly (
+                    attendance_id, employee_id, department_id, company_id, date,
+                    anomaly_type, severity, create_uid, create_date, write_uid, write_date
+                )
+                SELECT f.id, f.employee_id, e.department_id, e.company_id, f.work_day,
+                       f.anomaly_type, f.severity, %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+                  FROM flags f
+                  JOIN hr_employee e ON e.id = f.employee_id
+                 WHERE f.flagged
+                ON CONFLICT (attendance_id, anomaly_type) DO UPDATE
+                   SET employee_id = EXCLUDED.employee_id,
+                       department_id = EXCLUDED.department_id,
+                       company_id = EXCLUDED.company_id,
+                       date = EXCLUDED.date,
+                       write_uid = EXCLUDED.write_uid,
+                       write_date = EXCLUDED.write_date
+                 WHERE hr_attendance_anomaly.date IS DISTINCT FROM EXCLUDED.date
+                    OR hr_attendance_anomaly.employee_id <> EXCLUDED.employee_id
+                RETURNING (xmax = 0) AS is_new
+            )
+            SELECT (SELECT COUNT(*) FROM inserted WHERE is_new),
+                   (SELECT COUNT(*) FROM deleted)
+        """, {
+            'since': since,
+            'until': until,
+            'lookback': ANOMALY_OVERLAP_LOOKBACK,
+            'uid': self.env.uid,
+        })
+        inserted, deleted = self.env.cr.fetchone()
+        self.invalidate_model()
+        return inserted, deleted
+
+    def _scan_open_attendances(self):
+        # Las asistencias cerradas desde la última revisión dejan de ser anomalía
+        self.env.cr.execute("""
+            DELETE FROM hr_attendance_anomaly x
+             USING hr_attendance a
+             WHERE a.id = x.attendance_id
+               AND x.anomaly_type = 'open'
+               AND a.check_out IS NOT NULL
+        """)
+        self.env.cr.execute("""
+            INSERT INTO hr_attendance_anomaly (
+                attendance_id, employee_id, department_id, company_id, date,
+                anomaly_type, severity, create_uid, create_date, write_uid, write_date
+            )
+            SELECT a.id, a.employee_id, e.department_id, e.company_id, a.work_day,
+                   'open', 'high', %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+              FROM hr_attendance a
+              JOIN hr_employee e ON e.id = a.employee_id
+             WHERE a.check_out IS NULL
+               AND NOT COALESCE(a.computation_pending, FALSE)
+               AND a.check_in < (now() at time zone 'UTC') - %(open_limit)s
+            ON CONFLICT (attendance_id, anomaly_type) DO NOTHING
+        """, {
+            'open_limit': timedelta(hours=ANOMALY_OPEN_HOURS),
+            'uid': self.env.uid,
+        })
+        inserted = self.env.cr.rowcount
+        self.invalidate_model()
+        return inserted
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from pytz import timezone, UTC
+from time import perf_counter
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Tamaño del intervalo del mapa de cobertura
+COVERAGE_BUCKET_SECONDS = 3600
+
+
+def sweep_coverage(intervals, bucket_seconds=COVERAGE_BUCKET_SECONDS):
+    """
+    Barrido sobre eventos +1/-1: recibe intervalos ``(inicio, fin)`` en
+    segundos y devuelve ``{índice_de_intervalo: horas-persona}``. Los eventos
+    se ordenan una sola vez, O(n log n) más la cantidad de intervalos tocados.
+    """
+    events = []
+    for start, stop in intervals:
+        if stop > start:
+            events.append((start, 1))
+            events.append((stop, -1))
+    events.sort()
+
+    buckets = defaultdict(float)
+    active = 0
+    previous = None
+    for instant, delta in events:
+        if active and instant > previous:
+            # Repartir el tramo [previous, instant) entre los intervalos que cruza
+            segment_start = previous
+            while segment_start < instant:
+                index = int(segment_start // bucket_seconds)
+                segment_stop = min(instant, (index + 1) * bucket_seconds)
+                buckets[index] += active * (segment_stop - segment_start) / 3600.0
+                segment_start = segment_stop
+        active += delta
+        previous = instant
+    return buckets
+
+
+class HrAttendanceCoverageWizard(models.TransientModel):
+    _name = 'hr.attendance.coverage.wizard'
+    _description = 'Cobertura de personal'
+
+    date_from = fields.Date(string='Desde', required=True, default=lambda self: fields.Date.context_today(self).replace(day=1))
+    date_to = fields.Date(string='Hasta', required=True, default=fields.Date.context_today)
+    department_ids = fields.Many2many('hr.department', string='Departamentos')
+    line_ids = fields.One2many('hr.attendance.coverage.line', 'wizard_id', string='Cobertura')
+
+    @api.model
+    def _get_coverage(self, date_from, date_to, department_ids=None, tz_name=None):
+        """
+        Horas-persona presentes y programadas por departamento e intervalo de
+        una hora entre ``date_from`` y ``date_to`` (fechas locales, inclusive).
+
+        Devuelve ``{(department_id, inicio_utc): [presentes, programadas]}``.
+        Los intervalos se alinean a la hora local usando el desfase de la
+        zona al inicio del rango. Solo se incluyen las compañías activas del
+        usuario y los departamentos que puede leer.
+        """
+        self.env['hr.attendance'].check_access('read')
+        if department_ids:
+            # Solo departamentos visibles para el usuario
+            department_ids = self.env['hr.department'].search([('id', 'in', list(department_ids))]).ids
+            if not department_ids:
+                return {}
+        started = perf_counter()
+        tz = timezone(tz_name or self.env.user.tz or 'America/Asuncion')
+        range_start_local = datetime.combine(date_from, time.min)
+        range_start = tz.localize(range_start_local).astimezone(UTC).replace(tzinfo=None)
+        range_end = tz.localize(datetime.combine(date_to + timedelta(days=1), time.min)).astimezone(UTC).replace(tzinfo=None)
+        # Segundos desde el inicio local del rango: los intervalos quedan alineados a la hora local
+        origin = range_start
+        range_seconds = (range_end - range_start).total_seconds()
+        now_seconds = (fields.Datetime.now() - origin).total_seconds()
+
+        self.env['hr.attendance'].flush_model(['employee_id', 'check_in', 'check_out', 'scheduled_check_in', 'scheduled_check_out'])
+        self.env['hr.employee'].flush_model(['department_id'])
+        query = """
+            SELECT e.department_id,
+                   EXTRACT(EPOCH FROM a.check_in - %(origin)s)::float,
+                   EXTRACT(EPOCH FROM a.check_out - %(origin)s)::float,
+                   EXTRACT(EPOCH FROM a.scheduled_check_in - %(origin)s)::float,
+                   EXTRACT(EPOCH FROM a.scheduled_check_out - %(origin)s)::float
+              FROM hr_attendance a
+              JOIN hr_employee e ON e.id = a.employee_id
+             WHERE e.department_id IS NOT NULL
+               AND e.company_id = ANY(%(company_ids)s)
+               AND a.check_in < %(range_end)s
+               AND (a.check_out IS NULL OR a.check_out > %(range_start)s
+                    OR a.scheduled_check_out > %(range_start)s)
+        """
+        params = {
+            'origin': origin,
+            'range_start': range_start,
+            'range_end': range_end,
+            'company_ids': self.env.companies.ids,
+        }
+        if department_ids:
+            query += " AND e.department_id IN %(department_ids)s"
+            params['department_ids'] = tuple(department_ids)
+        self.env.cr.execute(query, params)
+
+        present = defaultdict(list)
+        scheduled = defaultdict(list)
+        for department_id, check_in, check_out, scheduled_in, scheduled_out in self.env.cr.fetchall():
+            # Asistencias abiertas: presentes hasta ahora
+            stop = check_out if check_out is not None else now_seconds
+            present[department_id].append((max(check_in, 0.0), min(stop, range_seconds)))
+            if scheduled_in is not None and scheduled_out is not None:
+                scheduled[department_id].append((max(scheduled_in, 0.0), min(scheduled_out, range_seconds)))
+
+        result = {}
+        for index, intervals_by_department in enumerate((present, scheduled)):
+            for department_id, intervals in intervals_by_department.items():
+                for bucket, hours in sweep_coverage(intervals).items():
+                    key = (department_id, origin + timedelta(seconds=bucket * COVERAGE_BUCKET_SECONDS))
+                    result.setdefault(key, [0.0, 0.0])[index] = hours
+
+        _logger.info(
+            "Cobertura de personal: %s intervalos en %.2fs",
+            len(result), perf_counter() - started,
+        )
+        return result
+
+    def action_compute(self):
+        self.ensure_one()
+        if self.date_from > self.date_to:
+            raise UserError(_("La fecha desde no puede ser posterior a la fecha hasta."))
+
+        tz = timezone(self.env.user.tz or 'America/Asuncion')
+        coverage = self._get_coverage(self.date_from, self.date_to, self.department_ids.ids)
+        self.line_ids.unlink()
+        lines = []
+        for (department_id, bucket_start), (present_hours, scheduled_hours) in coverage.items():
+            bucket_local = UTC.localize(bucket_start).astimezone(tz)
+            lines.append({
+                'wizard_id': self.id,
+                'department_id': department_id,
+                'bucket_start': bucket_start,
+                'weekday': str(bucket_local.weekday()),
+                'hour': bucket_local.hour,
+                'present_hours': present_hours,
+                'scheduled_hours': scheduled_hours,
+                'difference_hours': present_hours - scheduled_hours,
+            })
+        self.env['hr.attendance.coverage.line'].create(lines)
+
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Cobertura de personal'),
+            'res_model': 'hr.attendance.coverage.line',
+            'view_mode': 'pivot,graph,list',
+            'domain': [('wizard_id', '=', self.id)],
+            'target': 'current',
+        }
+
+
+class HrAttendanceCoverageLine(models.TransientModel):
+    _name = 'hr.attendance.coverage.line'
+    _description = 'Cobertura de personal por hora'
+    _order = 'bucket_start, department_id'
+
+    wizard_id = fields.Many2one('hr.attendance.coverage.wizard', required=True, ondelete='cascade', index=True)
+    department_id = fields.Many2one('hr.department', string='Departamento', readonly=True)
+    bucket_start = fields.Datetime(string='Hora', readonly=True)
+    weekday = fields.Selection([
+        ('0', 'Lunes'),
+        ('1', 'Martes'),
+        ('2', 'Miércoles'),
+        ('3', 'Jueves'),
+        ('4', 'Viernes'),
+        ('5', 'Sábado'),
+        ('6', 'Domingo'),
+    ], string='Día de la semana', readonly=True)
+    hour = fields.Integer(string='Hora del día', readonly=True, aggregator=False)
+    present_hours = fields.Float(string='Presentes (horas-persona)', readonly=True)
+    scheduled_hours = fields.Float(string='Programadas (horas-persona)', readonly=True)
+    difference_hours = fields.Float(string='Diferencia', readonly=True)
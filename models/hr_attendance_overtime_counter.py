@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Claves pendientes de actualizar antes del commit
+OVERTIME_COUNTER_PRECOMMIT_KEY = 'hr_attendance_overtime_counter_keys'
+OVERTIME_COUNTER_PERIOD_DAYS = {'day': 1, 'week': 7}
+
+
+class HrAttendanceOvertimeCounter(models.Model):
+    _name = 'hr.attendance.overtime.counter'
+    _description = 'Acumulado de horas extra por periodo'
+    _order = 'period_start desc, employee_id'
+
+    employee_id = fields.Many2one('hr.employee', string='Empleado', required=True, ondelete='cascade', index=True)
+    period_type = fields.Selection([
+        ('day', 'Día'),
+        ('week', 'Semana'),
+    ], string='Periodo', required=True)
+    period_start = fields.Date(string='Inicio', required=True)
+    overtime_hours = fields.Float(string='Horas extra calculadas', readonly=True)
+    approved_hours = fields.Float(string='Horas extra aprobadas', readonly=True)
+
+    _sql_constraints = [
+        ('employee_period_unique', 'unique(employee_id, period_type, period_start)',
+         'Ya existe un acumulado para este empleado y periodo.'),
+    ]
+
+    @api.model
+    def _get_period_keys(self, employee_id, day):
+        """Claves (empleado, tipo, inicio) del día y de la semana (lunes) de ``day``."""
+        return (
+            (employee_id, 'day', day),
+            (employee_id, 'week', day - timedelta(days=day.weekday())),
+        )
+
+    @api.model
+    def _mark_dirty(self, keys):
+        """Agrega claves a actualizar en el precommit de la transacción."""
+        if not keys:
+            return
+        precommit = self.env.cr.precommit
+        pending = precommit.data.get(OVERTIME_COUNTER_PRECOMMIT_KEY)
+        if pending is None:
+            pending = precommit.data[OVERTIME_COUNTER_PRECOMMIT_KEY] = set()
+            precommit.add(self._refresh_dirty)
+        pending.update(keys)
+
+    def _refresh_dirty(self):
+        keys = self.env.cr.precommit.data.pop(OVERTIME_COUNTER_PRECOMMIT_KEY, set())
+        self._refresh(keys)
+
+    @api.model
+    def _refresh(self, keys):
+        """
+        Recalcula por SQL los acumulados de las claves dadas a partir de las
+        asistencias de cada periodo (como mucho una semana por clave).
+        """
+        keys = list(keys)
+        if not keys:
+            return
+        self.env['hr.attendance'].flush_model([
+            'employee_id', 'work_day', 'overtime_hours', 'overtime_status',
+            'approved_overtime_day', 'approved_overtime_night',
+        ])
+        self.env.cr.execute("""
+            INSERT INTO hr_attendance_overtime_counter (
+                employee_id, period_type, period_start, overtime_hours, approved_hours,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT k.employee_id, k.period_type, k.period_start,
+                   COALESCE(SUM(a.overtime_hours), 0),
+                   COALESCE(SUM(a.approved_overtime_day + a.approved_overtime_night)
+                            FILTER (WHERE a.overtime_status = 'approved'), 0),
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+              FROM unnest(%(employee_ids)s::int[], %(period_types)s::varchar[], %(period_starts)s::date[])
+                   AS k(employee_id, period_type, period_start)
+              LEFT JOIN hr_attendance a
+                ON a.employee_id = k.employee_id
+               AND a.work_day >= k.period_start
+               AND a.work_day < k.period_start + CASE k.period_type WHEN 'day' THEN 1 ELSE 7 END
+             GROUP BY k.employee_id, k.period_type, k.period_start
+            ON CONFLICT (employee_id, period_type, period_start) DO UPDATE
+               SET overtime_hours = EXCLUDED.overtime_hours,
+                   approved_hours = EXCLUDED.approved_hours,
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+        """, {
+            'employee_ids': [key[0] for key in keys],
+            'period_types': [key[1] for key in keys],
+            'period_starts': [key[2] for key in keys],
+            'uid': self.env.uid,
+        })
+        self.invalidate_model()
+
+    @api.model
+    def _add_approved_hours(self, deltas):
+        """
+        Suma ``{(empleado, tipo, inicio): horas}`` a las horas aprobadas de
+        cada acumulado sin volver a recorrer las asistencias del periodo. El
+        recálculo del precommit concilia luego los valores.
+        """
+        deltas = {key: hours for key, hours in deltas.items() if hours}
+        if not deltas:
+            return
+        self.flush_model()
+        keys = list(deltas)
+        self.env.cr.execute("""
+            INSERT INTO hr_attendance_overtime_counter (
+                employee_id, period_type, period_start, overtime_hours, approved_hours,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT k.employee_id, k.period_type, k.period_start, 0, k.hours,
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+              FROM unnest(%(employee_ids)s::int[], %(period_types)s::varchar[],
+                          %(period_starts)s::date[], %(hours)s::float8[])
+                   AS k(employee_id, period_type, period_start, hours)
+            ON CONFLICT (employee_id, period_type, period_start) DO UPDATE
+               SET approved_hours = hr_attendance_overtime_counter.approved_hours + EXCLUDED.approved_hours,
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+        """, {
+            'employee_ids': [key[0] for key in keys],
+            'period_types': [key[1] for key in keys],
+            'period_starts': [key[2] for key in keys],
+            'hours': [deltas[key] for key in keys],
+            'uid': self.env.uid,
+        })
+        self.invalidate_model()
+
+    @api.model
+    def _get_approved_hours(self, keys):
+        """``{(empleado, tipo, inicio): horas aprobadas}`` leídas por clave única."""
+        keys = tuple(set(keys))
+        if not keys:
+            return {}
+        self.flush_model()
+        self.env.cr.execute("""
+            SELECT employee_id, period_type, period_start, approved_hours
+              FROM hr_attendance_overtime_counter
+             WHERE (employee_id, period_type, period_start) IN %s
+        """, [keys])
+        return {(employee_id, period_type, period_start): hours for employee_id, period_type, period_start, hours in self.env.cr.fetchall()}
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from datetime import datetime, time, timedelta
+from time import perf_counter
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Campos calculados de hr.attendance que se pueden recalcular con un trabajo.
+# overtime_day / overtime_night se asignan dentro del cálculo de overtime_hours.
+RECOMPUTE_JOB_FIELDS = [
+    'scheduled_check_in',
+    'scheduled_check_out',
+    'late_minutes',
+    'is_late',
+    'confirmed_late_minutes',
+    'night_hours',
+    'overtime_hours',
+    'out_of_schedule',
+    'worked_hours',
+]
+
+# Tiempo máximo (segundos) que una ejecución del cron dedica a los trabajos
+RECOMPUTE_JOB_TIME_BUDGET = 240
+
+
+class HrAttendanceRecomputeJob(models.Model):
+    _name = 'hr.attendance.recompute.job'
+    _inherit = ['mail.thread']
+    _description = 'Recálculo de asistencias'
+    _order = 'id desc'
+
+    name = fields.Char(string='Descripción', required=True, default=lambda self: _('Recálculo de asistencias'))
+    state = fields.Selection([
+        ('draft', 'Borrador'),
+        ('queued', 'En cola'),
+        ('running', 'En proceso'),
+        ('done', 'Terminado'),
+        ('failed', 'Error'),
+        ('cancelled', 'Cancelado'),
+    ], string='Estado', default='draft', required=True, index=True)
+
+    field_ids = fields.Many2many(
+        'ir.model.fields',
+        string='Campos a recalcular',
+        domain=[('model', '=', 'hr.attendance'), ('name', 'in', RECOMPUTE_JOB_FIELDS)],
+        default=lambda self: self._default_field_ids(),
+    )
+    date_from = fields.Date(string='Desde')
+    date_to = fields.Date(string='Hasta')
+    employee_ids = fields.Many2many('hr.employee', string='Empleados')
+    company_id = fields.Many2one('res.company', string='Compañía')
+    chunk_size = fields.Integer(string='Tamaño de lote', default=1000, required=True)
+
+    # Punto de control: último id procesado (las asistencias se recorren por id)
+    last_id = fields.Integer(string='Último ID procesado', default=0, readonly=True)
+    total_count = fields.Integer(string='Total', readonly=True)
+    processed_count = fields.Integer(string='Procesadas', readonly=True)
+    elapsed_seconds = fields.Float(string='Segundos de proceso', readonly=True)
+    started_at = fields.Datetime(string='Inicio', readonly=True)
+    finished_at = fields.Datetime(string='Fin', readonly=True)
+    error_message = fields.Text(string='Error', readonly=True)
+
+    progress = fields.Float(string='Progreso', compute='_compute_throughput')
+    rows_per_second = fields.Float(string='Filas/s', compute='_compute_throughput')
+    eta = fields.Datetime(string='Fin estimado', compute='_compute_throughput')
+
+    @api.model
+    def _default_field_ids(self):
+        return self.env['ir.model.fields'].search([
+            ('model', '=', 'hr.attendance'),
+            ('name', 'in', RECOMPUTE_JOB_FIELDS),
+        ])
+
+    @api.depends('processed_count', 'total_count', 'elapsed_seconds', 'state')
+    def _compute_throughput(self):
+        now = fields.Datetime.now()
+        for job in self:
+            job.progress = 100.0 * job.processed_count / job.total_count if job.total_count else 0.0
+            job.rows_per_second = job.processed_count / job.elapsed_seconds if job.elapsed_seconds else 0.0
+            remaining = max(job.total_count - job.processed_count, 0)
+            if job.state in ('queued', 'running') and job.rows_per_second and remaining:
+                job.eta = now + timedelta(seconds=remaining / job.rows_per_second)
+            else:
+                job.eta = False
+
+    def _get_attendance_domain(self):
+        self.ensure_one()
+        domain = []
+        if self.date_from:
+            domain.append(('check_in', '>=', datetime.combine(self.date_from, time.min)))
+        if self.date_to:
+            domain.append(('check_in', '<=', datetime.combine(self.date_to, time.max)))
+        if self.employee_ids:
+            domain.append(('employee_id', 'in', self.employee_ids.ids))
+        if self.company_id:
+            domain.append(('employee_id.company_id', '=', self.company_id.id))
+        return domain
+
+    # -------------------------------
+    # Acciones
+    # -------------------------------
+
+    def action_start(self):
+        for job in self:
+            if not job.field_ids:
+                raise UserError(_("Debe elegir al menos un campo a recalcular."))
+            job.write({
+                'state': 'queued',
+                'last_id': 0,
+                'processed_count': 0,
+                'elapsed_seconds': 0.0,
+                'error_message': False,
+                'finished_at': False,
+                'total_count': self.env['hr.attendance'].search_count(job._get_attendance_domain()),
+            })
+        self.env.ref('hr_holiday_attendance_views.ir_cron_attendance_recompute_jobs')._trigger()
+
+    def action_resume(self):
+        # Continúa desde el último punto de control
+        self.filtered(lambda j: j.state in ('failed', 'cancelled')).write({
+            'state': 'queued',
+            'error_message': False,
+        })
+        self.env.ref('hr_holiday_attendance_views.ir_cron_attendance_recompute_jobs')._trigger()
+
+    def action_cancel(self):
+        self.filtered(lambda j: j.state in ('draft', 'queued', 'running')).write({'state': 'cancelled'})
+
+    # -------------------------------
+    # Proceso
+    # -------------------------------
+
+    @api.model
+    def _get_fields_to_recompute(self, field_names):
+        """
+        Campos elegidos más los campos almacenados de hr.attendance que se
+        calculan con el mismo método o que dependen de ellos (un recálculo
+        forzado no dispara a sus dependientes).
+        """
+        Attendance = self.env['hr.attendance']
+        pending = [Attendance._fields[name] for name in field_names]
+        result = []
+        while pending:
+            field = pending.pop(0)
+            if field in result or not (field.compute and field.store):
+                continue
+            result.append(field)
+            # Campos asignados por el mismo cálculo (p. ej. el pipeline de asistencia)
+            pending.extend(self.pool.field_computed.get(field, []))
+            pending.extend(
+                dependent for dependent in self.pool.get_dependent_fields(field)
+                if dependent.model_name == 'hr.attendance'
+            )
+        return result
+
+    @api.model
+    def _queue(self, name, employee, date_from, date_to, field_names):
+        """Crea y encola un trabajo de recálculo acotado a un empleado y rango de fechas."""
+        job = self.sudo().create({
+            'name': name,
+            'employee_ids': [(6, 0, employee.ids)],
+            'date_from': date_from,
+            'date_to': date_to,
+            'field_ids': [(6, 0, self.env['ir.model.fields'].sudo().search([
+                ('model', '=', 'hr.attendance'),
+                ('name', 'in', field_names),
+            ]).ids)],
+        })
+        job.action_start()
+        return job
+
+    @api.model
+    def _cron_process_jobs(self, time_budget=RECOMPUTE_JOB_TIME_BUDGET):
+        """
+        Procesa los trabajos en cola por lotes de ids crecientes, confirmando
+        cada lote. Un trabajo interrumpido (caída del worker) sigue en estado
+        'running' y se retoma desde ``last_id`` en la siguiente ejecución.
+        """
+        deadline = perf_counter() + time_budget
+        for job in self.search([('state', 'in', ['queued', 'running'])], order='id'):
+            while perf_counter() < deadline:
+                if not job._process_chunk():
+                    break
+            if perf_counter() >= deadline:
+                # Queda trabajo pendiente: volver a ejecutar el cron cuanto antes
+                self.env.ref('hr_holiday_attendance_views.ir_cron_attendance_recompute_jobs')._trigger()
+                break
+
+    def _process_chunk(self):
+        """Recalcula el siguiente lote. Devuelve False cuando el trabajo terminó o falló."""
+        self.ensure_one()
+        # Sin seguimiento por asistencia: un mensaje resumen por lote en el trabajo
+        Attendance = self.env['hr.attendance'].sudo().with_context(tracking_disable=True, mail_notrack=True)
+        field_names = self.field_ids.mapped('name')
+
+        started = perf_counter()
+        try:
+            attendances = Attendance.search(
+                self._get_attendance_domain() + [('id', '>', self.last_id)],
+                order='id',
+                limit=self.chunk_size,
+            )
+            if not attendances:
+                self.write({'state': 'done', 'finished_at': fields.Datetime.now()})
+                self.env.cr.commit()
+                return False
+
+            for field in self._get_fields_to_recompute(field_names):
+                self.env.add_to_compute(field, attendances)
+            Attendance.env.flush_all()
+
+            self.write({
+                'state': 'running',
+                'last_id': attendances[-1].id,
+                'processed_count': self.processed_count + len(attendances),
+                'elapsed_seconds': self.elapsed_seconds + (perf_counter() - started),
+                'started_at': self.started_at or fields.Datetime.now(),
+            })
+            self.message_post(body=_(
+                "Lote recalculado: %(count)s asistencias (ID %(first)s a %(last)s), %(fields)s.",
+                count=len(attendances),
+                first=attendances[0].id,
+                last=attendances[-1].id,
+                fields=", ".join(self.field_ids.mapped('field_description')),
+            ))
+            self.env.cr.commit()
+            _logger.info(
+                "Recálculo de asistencias %s: %s/%s (%.0f filas/s)",
+                self.id, self.processed_count, self.total_count, self.rows_per_second,
+            )
+            return True
+        except Exception as e:
+            self.env.cr.rollback()
+            _logger.exception("Error en el recálculo de asistencias %s", self.id)
+            self.write({'state': 'failed', 'error_message': str(e)})
+            self.env.cr.commit()
+            return False
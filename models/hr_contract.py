@@ -8,17 +8,158 @@ import logging
 
 _logger = logging.getLogger(__name__)
 
+# Valor hora de contratos mensuales: 30 días de 8 horas
+MONTHLY_DAYS = 30
+DAILY_HOURS = 8
+
+# Multiplicadores sobre el valor hora (HED, HEN, recargo nocturno y guardias)
+OVERTIME_DAY_FACTOR = 1.5
+OVERTIME_NIGHT_FACTOR = 2.0
+NIGHT_SURCHARGE_FACTOR = 0.30
+GUARD_DAY_FACTOR = 1.5
+GUARD_NIGHT_FACTOR = 2.6
+GUARD_PAID_HOURS = 8.0
+
+# Franja nocturna para horas extra y guardias (hora local): 20:00 a 06:00
+NIGHT_START_HOUR = 20
+NIGHT_END_HOUR = 6
+
+# Totales de asistencia por empleado que consume la nómina
+PAYROLL_TOTAL_FIELDS = [
+    'approved_overtime_day',
+    'approved_overtime_night',
+    'guard_day_hours',
+    'guard_night_hours',
+    'night_hours',
+    'confirmed_late_minutes',
+]
+# Clave en ``cr.cache`` de los totales precargados para un lote de recibos
+PAYROLL_TOTALS_CACHE_KEY = 'hr_attendance_payroll_totals'
+
+# Campos del contrato que forman parte de la línea de tiempo de horarios
+SCHEDULE_TIMELINE_FIELDS = {'employee_id', 'state', 'date_start', 'date_end', 'resource_calendar_id'}
+
 class HrContract(models.Model):
     _inherit = 'hr.contract'
     hourly_rate = fields.Monetary(string="Por hora",compute='_compute_hourly_rate')
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        contracts = super().create(vals_list)
+        self.env['hr.schedule.resolver']._invalidate_timelines()
+        # Un contrato nuevo (p. ej. por aumento salarial) cambia el valor hora
+        # de las asistencias sin pagar de su periodo
+        contracts._recompute_unpaid_attendance_amounts()
+        return contracts
+
+    def write(self, vals):
+        timeline_changed = SCHEDULE_TIMELINE_FIELDS.intersection(vals)
+        # Asistencias que cubría el contrato antes del cambio de fechas,
+        # estado o empleado: pueden pasar a otro contrato
+        previous_attendances = self._get_unpaid_attendances() if timeline_changed else None
+        res = super().write(vals)
+        if timeline_changed:
+            self.env['hr.schedule.resolver']._invalidate_timelines()
+        if timeline_changed or 'wage' in vals:
+            self._recompute_unpaid_attendance_amounts(previous_attendances)
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env['hr.schedule.resolver']._invalidate_timelines()
+        return res
+
     def _compute_hourly_rate(self):
         for record in self:
             if record.schedule_pay == 'monthly':
-                record.hourly_rate = record.wage / 30 / 8
+                record.hourly_rate = record._get_attendance_hourly_rate()
             else:
                  record.hourly_rate = 0
 
+    def _get_attendance_hourly_rate(self):
+        self.ensure_one()
+        return self.wage / MONTHLY_DAYS / DAILY_HOURS
+
+    def _recompute_unpaid_attendance_amounts(self, attendances=None):
+        """
+        Recalcula los montos de horas extra de las asistencias cubiertas por
+        estos contratos que todavía no fueron pagadas (posteriores al último
+        recibo pagado del empleado), más las ``attendances`` indicadas.
+        """
+        Attendance = self.env['hr.attendance'].sudo()
+        attendances = self._get_unpaid_attendances() | (attendances or Attendance)
+        if attendances:
+            for field_name in Attendance._get_overtime_amount_fields():
+                self.env.add_to_compute(Attendance._fields[field_name], attendances)
+
+    def _get_unpaid_attendances(self):
+        """Asistencias del periodo de estos contratos aún no pagadas."""
+        Attendance = self.env['hr.attendance'].sudo()
+        if not self:
+            return Attendance
+        paid_until = dict(self.env['hr.payslip'].sudo()._read_group(
+            [('employee_id', 'in', self.employee_id.ids), ('state', '=', 'paid')],
+            ['employee_id'],
+            ['date_to_events:max'],
+        ))
+        attendances = Attendance
+        for contract in self:
+            domain = [
+                ('employee_id', '=', contract.employee_id.id),
+                ('work_day', '>=', contract.date_start),
+            ]
+            if contract.date_end:
+                domain.append(('work_day', '<=', contract.date_end))
+            last_paid = paid_until.get(contract.employee_id)
+            if last_paid:
+                domain.append(('work_day', '>', last_paid))
+            attendances |= Attendance.search(domain)
+        return attendances
+
+    def _get_attendance_payroll_totals(self, date_from, date_to):
+        """
+        ``{employee_id: {campo: suma}}`` de las asistencias cerradas de los
+        empleados de estos contratos cuyo día de trabajo cae en el rango. Usa
+        los totales precargados por ``_warm_attendance_payroll_totals`` si
+        cubren a todos los empleados.
+        """
+        warmed = self.env.cr.cache.get((PAYROLL_TOTALS_CACHE_KEY, date_from, date_to))
+        if warmed is not None:
+            employee_ids, totals_by_employee = warmed
+            if employee_ids.issuperset(self.employee_id.ids):
+                return totals_by_employee
+        return self._read_attendance_payroll_totals(self.employee_id.ids, date_from, date_to)
+
+    @api.model
+    def _read_attendance_payroll_totals(self, employee_ids, date_from, date_to):
+        # Una sola consulta agrupada por empleado sobre el índice (employee_id, work_day)
+        groups = self.env['hr.attendance'].sudo()._read_group(
+            [
+                ('employee_id', 'in', employee_ids),
+                ('work_day', '>=', date_from),
+                ('work_day', '<=', date_to),
+                ('check_out', '!=', False),
+            ],
+            ['employee_id'],
+            ['%s:sum' % field_name for field_name in PAYROLL_TOTAL_FIELDS],
+        )
+        return {
+            employee.id: dict(zip(PAYROLL_TOTAL_FIELDS, (total or 0.0 for total in totals)))
+            for employee, *totals in groups
+        }
+
+    @api.model
+    def _warm_attendance_payroll_totals(self, employee_ids, date_from, date_to):
+        """Precarga en ``cr.cache`` los totales de un lote de recibos con la misma ventana."""
+        self.env.cr.cache[(PAYROLL_TOTALS_CACHE_KEY, date_from, date_to)] = (
+            frozenset(employee_ids),
+            self._read_attendance_payroll_totals(employee_ids, date_from, date_to),
+        )
+
+    @api.model
+    def _clear_attendance_payroll_totals(self, date_from, date_to):
+        self.env.cr.cache.pop((PAYROLL_TOTALS_CACHE_KEY, date_from, date_to), None)
+
     def _preprocess_work_hours_data(self, work_data, date_from, date_to):
         """
         Extiende el método para soportar:
@@ -39,13 +180,13 @@ class HrContract(models.Model):
             return
 
         # === Tipos de entrada para HORAS EXTRA ===
-        overtime_normal_type = self.env['hr.work.entry.type'].search([('code', '=', 'OVERTIME')], limit=1)
-        overtime_day_type = self.env['hr.work.entry.type'].search([('code', '=', 'OVERTIME_EVENING')], limit=1)
-        overtime_night_type = self.env['hr.work.entry.type'].search([('code', '=', 'OVERTIME_NIGHT')], limit=1)
+        overtime_normal_type = self.env['hr.work.entry.type']._get_by_code('OVERTIME')
+        overtime_day_type = self.env['hr.work.entry.type']._get_by_code('OVERTIME_EVENING')
+        overtime_night_type = self.env['hr.work.entry.type']._get_by_code('OVERTIME_NIGHT')
 
         # === Tipos de entrada para GUARDIAS ===
-        guard_day_type = self.env['hr.work.entry.type'].search([('code', '=', 'GUARD_EVENING')], limit=1)
-        guard_night_type = self.env['hr.work.entry.type'].search([('code', '=', 'GUARD_NIGHT')], limit=1)
+        guard_day_type = self.env['hr.work.entry.type']._get_by_code('GUARD_EVENING')
+        guard_night_type = self.env['hr.work.entry.type']._get_by_code('GUARD_NIGHT')
 
         # Validar que existan los tipos necesarios
         if not overtime_day_type or not overtime_night_type:
@@ -55,63 +196,19 @@ class HrContract(models.Model):
             # Puedes return si las guardias son obligatorias
             # return
 
-        # Rangos horarios
-        NIGHT_START = 20  # 10 PM
-        NIGHT_END = 6     # 6 AM
-
-        # === Buscar asistencias en el rango ===
-        attendances = self.env['hr.attendance'].sudo().search([
-            ('employee_id', 'in', self.employee_id.ids),
-            ('check_in_date', '>=', date_from.date()),
-            ('check_in_date', '<=', date_to.date()),
-        ])
-        _logger.info("Asistencias encontradas: %s", len(attendances))
-        for attendance in attendances:
-            _logger.info(f"{attendance.check_in}-{attendance.check_out}, Nocturno:{attendance.night_hours}")
-        # Acumuladores
-        total_overtime = 0.0
-        total_guards = 0.0
-
-        overtime_day_hours = 0.0
-        overtime_night_hours = 0.0
-
-        guard_day_hours = 0.0
-        guard_night_hours = 0.0
-
-        for att in attendances:
-            # === CASO 1: Es una GUARDIA ===
-            if att.is_guard:
-                # Usar las horas totales trabajadas (no solo overtime)
-                hours = att.worked_hours
-                if hours <= 0:
-                    continue
-
-                hour_in = att.check_in.hour
-                if hour_in >= NIGHT_START or hour_in < NIGHT_END:
-                    guard_night_hours += hours
-                else:
-                    guard_day_hours += hours
-                total_guards += hours
-
-            # === CASO 2: Es HORA EXTRA (y NO es guardia) ===
-            elif not att.is_guard and att.validated_overtime_hours > 0 and att.overtime_status == 'approved':
-                # Calcular el rango de las horas extra (asumiendo que están al final)
-                overtime_end = att.check_out
-                overtime_start = overtime_end - timedelta(hours=att.validated_overtime_hours)
-                
-                # Calcular cuántas de esas horas extra son nocturnas (en hora local)
-                night_overtime = self._get_night_hours_between(
-                    overtime_start, 
-                    overtime_end, 
-                    night_start=NIGHT_START, 
-                    night_end=NIGHT_END,
-                    tz_name='America/Asuncion'
-                )
-                day_overtime = att.overtime_hours - night_overtime
-            
-                overtime_night_hours += night_overtime
-                overtime_day_hours += day_overtime
-                total_overtime += att.overtime_hours
+        # === Totales del rango (precargados para todo el lote si es posible) ===
+        totals_by_employee = self._get_attendance_payroll_totals(date_from.date(), date_to.date())
+        totals = {
+            field_name: sum(totals_by_employee.get(employee.id, {}).get(field_name, 0.0) for employee in self.employee_id)
+            for field_name in PAYROLL_TOTAL_FIELDS
+        }
+        overtime_day_hours = totals['approved_overtime_day']
+        overtime_night_hours = totals['approved_overtime_night']
+        guard_day_hours = totals['guard_day_hours']
+        guard_night_hours = totals['guard_night_hours']
+        total_night_hours = totals['night_hours']
+        total_overtime = overtime_day_hours + overtime_night_hours
+        total_guards = guard_day_hours + guard_night_hours
 
         # === 1. Aplicar HORAS EXTRA ===
         if total_overtime > 0 and default_work_entry_type.id in work_data:
@@ -136,17 +233,9 @@ class HrContract(models.Model):
             work_data[guard_night_type.id] = work_data.get(guard_night_type.id, 0) + guard_night_hours
 
         # === 3. Aplicar RETRASOS CONFIRMADOS ===
-        late_type = self.env['hr.work.entry.type'].search([('code', '=', 'LATE')], limit=1)
+        late_type = self.env['hr.work.entry.type']._get_by_code('LATE')
         if late_type:
-            # Buscar asistencias con retraso confirmado > 0 en el rango
-            late_attendances = self.env['hr.attendance'].sudo().search([
-                ('employee_id', 'in', self.employee_id.ids),
-                ('check_in', '>=', date_from),
-                ('check_out', '<=', date_to),
-                ('confirmed_late_minutes', '>', 0),
-            ])
-
-            total_late_minutes = sum(att.confirmed_late_minutes for att in late_attendances)
+            total_late_minutes = totals['confirmed_late_minutes']
             total_late_hours = total_late_minutes / 60.0  # convertir a horas
 
             work_data[late_type.id] = work_data.get(late_type.id, 0) + total_late_hours
@@ -155,33 +244,11 @@ class HrContract(models.Model):
         else:
             _logger.warning("No se encontró work entry type con código 'LATE_CONFIRMED' para retrasos confirmados.")
         
-        recargo_nocturno_type = self.env['hr.work.entry.type'].search([('code', '=', 'RECARGON')], limit=1)
+        recargo_nocturno_type = self.env['hr.work.entry.type']._get_by_code('RECARGON')
         if recargo_nocturno_type:
             _logger.info("Inicio cálculo recargo nocturno")
         
-            total_recargo_nocturno = 0.0
-        
-            for att in attendances:
-                if not att.check_in or not att.check_out:
-                    continue
-        
-                total_att_hours = (att.check_out - att.check_in).total_seconds() / 3600
-        
-                if total_att_hours <= 0:
-                    continue
-        
-                night_hours = att.night_hours or 0.0
-        
-                # === Ajuste si hay overtime no aprobado ===
-                #if att.validated_overtime_hours > 0 and att.overtime_status != 'approved':
-                #    overtime_duration = att.validated_overtime_hours
-                #    normal_hours = max(total_att_hours - overtime_duration, 0)
-                #    if normal_hours == 0:
-                #        continue
-                #    ratio = normal_hours / total_att_hours
-                #    night_hours *= ratio
-        
-                total_recargo_nocturno += night_hours
+            total_recargo_nocturno = total_night_hours
         
             if total_recargo_nocturno > 0:
                 work_data[recargo_nocturno_type.id] = (
@@ -233,7 +300,7 @@ class HrContract(models.Model):
         work_data.update({work_entry_type.id: duration_sum for work_entry_type, duration_sum in work_entries})
         self._preprocess_work_hours_data(work_data, date_from, date_to)
 
-        leave_types = self.env['hr.work.entry.type'].search([('is_leave', '=', True)])
+        leave_types = self.env['hr.work.entry.type']._get_leave_types()
         leave_type_ids = leave_types.ids
     
         if leave_type_ids:
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields, api
+from odoo import models, fields, api, tools, _
+from odoo.exceptions import UserError
 from collections import defaultdict
 from datetime import datetime,timedelta
 from odoo.addons.resource.models.utils import Intervals
@@ -9,6 +10,13 @@ import logging
 
 _logger = logging.getLogger(__name__)
 
+# Campos del cambio de turno que alteran el horario de las asistencias
+SHIFT_CHANGE_WINDOW_FIELDS = {'employee_id', 'calendar_id', 'date_start', 'date_end', 'state'}
+# Margen para recalcular también el turno vecino a cada extremo
+SHIFT_CHANGE_MARGIN = timedelta(days=1)
+# Rango máximo de días de una consulta de turnos esperados
+EXPECTED_SHIFT_MAX_DAYS = 31
+
 class HrEmployee(models.Model):
     _inherit = 'hr.employee'
 
@@ -28,31 +36,167 @@ class HrEmployee(models.Model):
     
         intervals = super()._employee_attendance_intervals(start_dt, end_dt, lunch=lunch)
     
-        # 🔥 Normalizar a UTC naive (como guarda Odoo)
-
-    
-        # Buscar cambios que intersecten el rango
-        shift_changes = self.env['hr.employee.shift.change'].search([
-            ('employee_id', '=', self.id),
-            ('state', '=', 'approved'),
-            ('date_start', '<=', end_dt),
-            ('date_end', '>=', start_dt),
-        ])
-    
-        if not shift_changes:
-            return intervals
+        # Sumar los horarios de los cambios de turno que intersectan el rango
+        extra_intervals = self._shift_change_intervals_batch(start_dt, end_dt, lunch=lunch)
+        if self.resource_id.id in extra_intervals:
+            intervals |= extra_intervals[self.resource_id.id]
     
-        for change in shift_changes:
-            extra_intervals = change.calendar_id._attendance_intervals_batch(
+        return intervals
+
+    def _employee_attendance_intervals_batch(self, start_dt, end_dt, lunch=False):
+        """
+        Variante por lotes de ``_employee_attendance_intervals``: devuelve
+        ``{resource_id: Intervals}``. Los empleados se agrupan por calendario
+        (el propio o el de la compañía), zona horaria y compañía, y cada grupo
+        se resuelve con la misma llamada por calendario que usa el cálculo por
+        empleado; luego se suman los cambios de turno.
+        """
+        employees_by_group = defaultdict(lambda: self.env['hr.employee'])
+        for employee in self:
+            calendar = employee.resource_calendar_id or employee.company_id.resource_calendar_id
+            employees_by_group[calendar, employee.tz, employee.company_id] |= employee
+
+        result = {}
+        for (calendar, tz_name, company), employees in employees_by_group.items():
+            resources = employees.resource_id
+            if not calendar:
+                result.update({resource.id: Intervals() for resource in resources})
+                continue
+            if lunch:
+                calendar_intervals = calendar._attendance_intervals_batch(start_dt, end_dt, resources, lunch=True)
+            else:
+                # Igual que el cálculo por empleado: zona del empleado, ausencias y feriados de su compañía
+                calendar_intervals = calendar._work_intervals_batch(
+                    start_dt,
+                    end_dt,
+                    resources=resources,
+                    tz=timezone(tz_name) if tz_name else None,
+                    domain=[('company_id', 'in', [False, company.id])],
+                )
+            result.update({resource.id: calendar_intervals[resource.id] for resource in resources})
+
+        for resource_id, extra_intervals in self._shift_change_intervals_batch(start_dt, end_dt, lunch=lunch).items():
+            result[resource_id] = result.get(resource_id, Intervals()) | extra_intervals
+        return result
+
+    def _shift_change_intervals_batch(self, start_dt, end_dt, lunch=False):
+        """
+        Intervalos de los cambios de turno aprobados que intersectan el rango,
+        ``{resource_id: Intervals}``. Los cambios de todos los empleados se
+        cargan juntos y cada calendario se calcula una vez.
+        """
+        resolver = self.env['hr.schedule.resolver']
+        start_utc = self._to_utc_naive(start_dt)
+        end_utc = self._to_utc_naive(end_dt)
+
+        resources_by_calendar = defaultdict(lambda: self.env['resource.resource'])
+        timelines = resolver._get_timelines(self.ids)
+        for employee in self:
+            if employee.id not in timelines:
+                continue
+            dummy, shifts = timelines[employee.id]
+            for change in shifts.overlapping(start_utc, end_utc):
+                resources_by_calendar[change.calendar_id] |= employee.resource_id
+
+        result = defaultdict(Intervals)
+        for calendar_id, resources in resources_by_calendar.items():
+            calendar_intervals = self.env['resource.calendar'].browse(calendar_id)._cached_attendance_intervals_batch(
                 start_dt,
                 end_dt,
-                self.resource_id,
+                resources,
                 lunch=lunch
-            ).get(self.resource_id.id, Intervals())
-    
-            intervals |= extra_intervals
-    
-        return intervals
+            )
+            for resource in resources:
+                result[resource.id] |= calendar_intervals.get(resource.id, Intervals())
+        return result
+
+    def _get_remaining_overtime(self, day):
+        """
+        Horas extra que todavía se pueden aprobar el día ``day`` y en su
+        semana, según los máximos de la compañía: ``{'day': h, 'week': h}``
+        (None si no hay máximo).
+        """
+        self.ensure_one()
+        Counter = self.env['hr.attendance.overtime.counter']
+        day_key, week_key = Counter._get_period_keys(self.id, day)
+        approved = Counter._get_approved_hours([day_key, week_key])
+        company = self.company_id
+        return {
+            'day': max(company.overtime_daily_cap - approved.get(day_key, 0.0), 0.0) if company.overtime_daily_cap else None,
+            'week': max(company.overtime_weekly_cap - approved.get(week_key, 0.0), 0.0) if company.overtime_weekly_cap else None,
+        }
+
+    def get_expected_shift(self, date_from, date_to=None):
+        """
+        Turnos esperados del empleado entre ``date_from`` y ``date_to`` (días
+        locales, inclusive), incluyendo cambios de turno aprobados. Pensado
+        para kioscos y portal: el resultado se guarda en la caché del registro,
+        que se vacía al cambiar contratos, cambios de turno o líneas de
+        calendario.
+        """
+        self.ensure_one()
+        date_from = fields.Date.to_date(date_from)
+        date_to = fields.Date.to_date(date_to) or date_from
+        if date_to < date_from or (date_to - date_from).days >= EXPECTED_SHIFT_MAX_DAYS:
+            raise UserError(_("El rango debe tener entre 1 y %s días.", EXPECTED_SHIFT_MAX_DAYS))
+        resolver = self.env['hr.schedule.resolver']
+        days = [date_from + timedelta(days=offset) for offset in range((date_to - date_from).days + 1)]
+        schedules = tuple(resolver._get_day_schedule(self, day) for day in days)
+        blocks = self._get_expected_shift_blocks(
+            date_from,
+            schedules,
+            self.tz or 'UTC',
+            self.company_id.attendance_shift_merge_tolerance,
+        )
+        return [
+            {
+                'date': fields.Date.to_string(day),
+                'calendar_id': calendar_id,
+                'shift_change': bool(shift_change_id),
+                'start': fields.Datetime.to_string(start),
+                'stop': fields.Datetime.to_string(stop),
+                'start_local': start_local,
+                'stop_local': stop_local,
+            }
+            for day, calendar_id, shift_change_id, start, stop, start_local, stop_local in blocks
+        ]
+
+    @tools.ormcache('self.id', 'date_from', 'schedules', 'tz_name', 'tolerance')
+    def _get_expected_shift_blocks(self, date_from, schedules, tz_name, tolerance):
+        # La clave incluye el calendario y el cambio de turno resueltos para cada día
+        tz = pytz.timezone(tz_name)
+        blocks = []
+        for offset, (calendar_id, shift_change_id) in enumerate(schedules):
+            if not calendar_id:
+                continue
+            day = date_from + timedelta(days=offset)
+            calendar = self.env['resource.calendar'].browse(calendar_id)
+            for start, stop in calendar._get_day_shift_blocks(day, tz, tolerance, self.resource_id):
+                blocks.append((
+                    day,
+                    calendar_id,
+                    shift_change_id,
+                    tz.localize(start).astimezone(pytz.UTC).replace(tzinfo=None),
+                    tz.localize(stop).astimezone(pytz.UTC).replace(tzinfo=None),
+                    start.strftime('%H:%M') if start.date() == day else start.strftime('%d/%m %H:%M'),
+                    stop.strftime('%H:%M') if stop.date() == day else stop.strftime('%d/%m %H:%M'),
+                ))
+        return tuple(blocks)
+
+    def _attendance_action_change(self, *args, **kwargs):
+        # Marcación rápida: los cálculos costosos se difieren a un proceso por lotes
+        if self.company_id.attendance_fast_check_in:
+            self = self.with_context(
+                attendance_fast_check_in=True,
+                tracking_disable=True,
+            )
+        return super(HrEmployee, self)._attendance_action_change(*args, **kwargs)
+
+    @api.model
+    def _to_utc_naive(self, dt):
+        if dt.tzinfo:
+            return dt.astimezone(pytz.UTC).replace(tzinfo=None)
+        return dt
 
 class HrEmployeeShiftChange(models.Model):
     _name = 'hr.employee.shift.change'
@@ -69,4 +213,64 @@ class HrEmployeeShiftChange(models.Model):
     state = fields.Selection([
         ('approved', 'Aprobado'),
         ('cancelled', 'Cancelado'),
-    ], default='approved')
\ No newline at end of file
+    ], default='approved')
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['hr.schedule.resolver']._invalidate_timelines()
+        records._queue_attendance_recompute(records._get_recompute_windows())
+        return records
+
+    def write(self, vals):
+        windows = self._get_recompute_windows() if SHIFT_CHANGE_WINDOW_FIELDS.intersection(vals) else []
+        res = super().write(vals)
+        if windows:
+            self.env['hr.schedule.resolver']._invalidate_timelines()
+            self._queue_attendance_recompute(windows + self._get_recompute_windows())
+        return res
+
+    def unlink(self):
+        windows = self._get_recompute_windows()
+        res = super().unlink()
+        self.env['hr.schedule.resolver']._invalidate_timelines()
+        self._queue_attendance_recompute(windows)
+        return res
+
+    def _get_recompute_windows(self):
+        """
+        (empleado, desde, hasta) afectados por cada cambio de turno: su rango
+        más un día a cada lado para cubrir los turnos vecinos.
+        """
+        return [
+            (change.employee_id, (change.date_start - SHIFT_CHANGE_MARGIN).date(), (change.date_end + SHIFT_CHANGE_MARGIN).date())
+            for change in self
+            if change.employee_id and change.date_start and change.date_end
+        ]
+
+    @api.model
+    def _queue_attendance_recompute(self, windows):
+        # Un trabajo por empleado y rango; solo se unen los rangos que se solapan o se tocan
+        ranges = defaultdict(list)
+        for employee, date_from, date_to in windows:
+            ranges[employee].append((date_from, date_to))
+        Job = self.env['hr.attendance.recompute.job']
+        for employee, employee_ranges in ranges.items():
+            for date_from, date_to in self._merge_date_ranges(employee_ranges):
+                Job._queue(
+                    "Cambio de horario: %s" % employee.name,
+                    employee,
+                    date_from,
+                    date_to,
+                    ['scheduled_check_in', 'scheduled_check_out', 'worked_hours'],
+                )
+
+    @api.model
+    def _merge_date_ranges(self, ranges):
+        merged = []
+        for date_from, date_to in sorted(ranges):
+            if merged and date_from <= merged[-1][1] + timedelta(days=1):
+                merged[-1][1] = max(merged[-1][1], date_to)
+            else:
+                merged.append([date_from, date_to])
+        return [tuple(date_range) for date_range in merged]
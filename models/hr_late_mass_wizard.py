@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+
+class HrAttendanceLateMassWizard(models.TransientModel):
+    _name = 'hr.attendance.late.mass.wizard'
+    _description = 'Aprobación masiva de llegadas tardías'
+
+    action = fields.Selection([
+        ('approve', 'Aprobar (Penalizar)'),
+        ('refuse', 'Rechazar (No penalizar)'),
+    ], string='Acción', default='approve', required=True)
+    department_id = fields.Many2one('hr.department', string='Departamento')
+    employee_ids = fields.Many2many('hr.employee', string='Empleados')
+    date_from = fields.Date(string='Desde')
+    date_to = fields.Date(string='Hasta')
+    min_late_minutes = fields.Float(string='Mínimo de minutos tarde')
+    candidate_count = fields.Integer(string='Registros a procesar', compute='_compute_candidate_count')
+
+    @api.depends('department_id', 'employee_ids', 'date_from', 'date_to', 'min_late_minutes')
+    def _compute_candidate_count(self):
+        Attendance = self.env['hr.attendance']
+        for wizard in self:
+            wizard.candidate_count = Attendance.search_count(wizard._get_attendance_domain())
+
+    def _get_attendance_domain(self):
+        self.ensure_one()
+        # Mismo criterio que la gestión de llegadas tardías
+        domain = [
+            ('is_late', '=', True),
+            ('check_out', '!=', False),
+            ('late_status', '=', 'to_approve'),
+        ]
+        if self.date_from:
+            domain.append(('work_day', '>=', self.date_from))
+        if self.date_to:
+            domain.append(('work_day', '<=', self.date_to))
+        if self.min_late_minutes:
+            domain.append(('late_minutes', '>=', self.min_late_minutes))
+        if self.department_id:
+            domain.append(('employee_id.department_id', 'child_of', self.department_id.id))
+        if self.employee_ids:
+            domain.append(('employee_id', 'in', self.employee_ids.ids))
+        return domain
+
+    def action_apply(self):
+        self.ensure_one()
+        if self.date_from and self.date_to and self.date_from > self.date_to:
+            raise UserError(_("La fecha desde no puede ser posterior a la fecha hasta."))
+
+        attendances = self.env['hr.attendance'].search(self._get_attendance_domain())
+        target_status = 'approved' if self.action == 'approve' else 'refused'
+        # Una sola escritura sin seguimiento por asistencia: confirmed_late_minutes
+        # se recalcula en un solo paso
+        attendances.with_context(tracking_disable=True, mail_notrack=True).write({'late_status': target_status})
+
+        # Un mensaje resumen por empleado en lugar de uno por asistencia
+        status_label = dict(self.env['hr.attendance']._fields['late_status']._description_selection(self.env))[target_status]
+        attendances_by_employee = attendances.grouped('employee_id')
+        bodies = {
+            employee.id: _(
+                "Llegadas tardías actualizadas en lote a \"%(status)s\": %(count)s registros (%(date_from)s a %(date_to)s).",
+                status=status_label,
+                count=len(employee_attendances),
+                date_from=min(employee_attendances.mapped('work_day')),
+                date_to=max(employee_attendances.mapped('work_day')),
+            )
+            for employee, employee_attendances in attendances_by_employee.items()
+        }
+        if bodies:
+            self.env['hr.employee'].browse(list(bodies))._message_log_batch(bodies=bodies)
+
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _("Llegadas tardías"),
+                'message': _("%s registros actualizados.", len(attendances)),
+                'type': 'success',
+                'sticky': False,
+                'next': {'type': 'ir.actions.act_window_close'},
+            },
+        }
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api, Command, _
+from collections import defaultdict
 from datetime import date,datetime,timedelta
 from dateutil.relativedelta import relativedelta
 from odoo.exceptions import UserError
@@ -159,6 +160,22 @@ class HrContract(models.Model):
                     }))
                 slip.update({'input_line_ids': input_line_vals})
 
+    def _compute_worked_days_line_ids(self):
+        # Totales de asistencia del lote: una consulta por ventana de novedades
+        # en lugar de varias por recibo; se descartan al terminar
+        Contract = self.env['hr.contract']
+        windows = defaultdict(set)
+        for slip in self:
+            if slip.employee_id and slip.date_from_events and slip.date_to_events:
+                windows[slip.date_from_events, slip.date_to_events].add(slip.employee_id.id)
+        for (date_from, date_to), employee_ids in windows.items():
+            Contract._warm_attendance_payroll_totals(list(employee_ids), date_from, date_to)
+        try:
+            return super()._compute_worked_days_line_ids()
+        finally:
+            for date_from, date_to in windows:
+                Contract._clear_attendance_payroll_totals(date_from, date_to)
+
     def get_absences(self,work_hours):
         _logger.info("Ausencias")
         _logger.info(work_hours)
@@ -285,7 +302,7 @@ class HrContract(models.Model):
     
         # === Paso 3: Agregar la línea de ausencia no justificada (si aplica) ===
         if unjustified_days > 0:
-            unjustified_type = self.env['hr.work.entry.type'].search([('code', '=', 'UNJUSTIFIED')], limit=1)
+            unjustified_type = self.env['hr.work.entry.type']._get_by_code('UNJUSTIFIED')
             if unjustified_type:
                 res.append({
                     'sequence': unjustified_type.sequence or 999,
@@ -320,17 +337,20 @@ class HrContract(models.Model):
         return sorted(res, key=lambda d: work_entry_type.browse(d['work_entry_type_id']).sequence)
 
     def _count_work_days(self,employee, date_from, date_to):
-        calendar = employee.resource_calendar_id
-    
-        if not calendar:
-            return (date_to - date_from).days + 1
-    
+        resolver = self.env['hr.schedule.resolver']
         tz = pytz.timezone(employee.tz or 'UTC')
     
         work_days = 0
         current_day = date_from
     
         while current_day <= date_to:
+            # Horario efectivo del día (contrato o cambio de turno aprobado)
+            calendar = resolver._get_day_calendar(employee, current_day)
+            if not calendar:
+                work_days += 1
+                current_day += timedelta(days=1)
+                continue
+
             day_start = tz.localize(datetime.combine(current_day, datetime.min.time()))
             day_end = tz.localize(datetime.combine(current_day, datetime.max.time()))
     
@@ -496,7 +516,7 @@ class HrContract(models.Model):
         
             if unjustified_days > 0:
                 # Buscar o crear un tipo de entrada para "Ausencia no justificada"
-                unjustified_type = self.env['hr.work.entry.type'].search([('code', '=', 'UNJUSTIFIED')], limit=1)
+                unjustified_type = self.env['hr.work.entry.type']._get_by_code('UNJUSTIFIED')
                 if not unjustified_type:
                     # Opcional: crearlo si no existe (mejor hacerlo desde interfaz)
                     _logger.warning("No se encontró tipo de entrada 'UNJUSTIFIED'")
@@ -1203,10 +1223,7 @@ class HrContract(models.Model):
     def get_return_to_work_date(self):
         self.ensure_one()
     
-        calendar = self.employee_id.resource_calendar_id
-        if not calendar:
-            return self.date_to + timedelta(days=1)
-    
+        resolver = self.env['hr.schedule.resolver']
         tz = pytz.timezone(self.employee_id.tz or 'UTC')
     
         current_day = self.date_to + timedelta(days=1)
@@ -1214,6 +1231,11 @@ class HrContract(models.Model):
         # Buscamos hasta 30 días por seguridad
         for _i in range(30):
     
+            # Horario efectivo del día (contrato o cambio de turno aprobado)
+            calendar = resolver._get_day_calendar(self.employee_id, current_day)
+            if not calendar:
+                return current_day
+    
             day_start = tz.localize(
                 datetime.combine(current_day, datetime.min.time())
             )
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from collections import defaultdict
+from datetime import timedelta
+from time import perf_counter
+import logging
+
+from .hr_contract import (
+    MONTHLY_DAYS, DAILY_HOURS, OVERTIME_DAY_FACTOR, OVERTIME_NIGHT_FACTOR,
+    NIGHT_SURCHARGE_FACTOR, GUARD_DAY_FACTOR, GUARD_NIGHT_FACTOR, GUARD_PAID_HOURS,
+)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_logger = logging.getLogger(__name__)
+
+# Días finales de lo transcurrido que se promedian para proyectar el resto
+FORECAST_TRAILING_DAYS = 7
+
+
+class HrPayslipRun(models.Model):
+    _inherit = 'hr.payslip.run'
+
+    def action_forecast_overtime(self):
+        """
+        Proyección de costos de horas extra, recargo nocturno y guardias por
+        departamento para la ventana de novedades, sin calcular recibos.
+        """
+        self.ensure_one()
+        if not self.date_from_events or not self.date_to_events:
+            raise UserError(_("El lote no tiene ventana de novedades."))
+
+        Forecast = self.env['hr.payslip.run.overtime.forecast']
+        Forecast.search([('run_id', '=', self.id)]).unlink()
+        Forecast.create(Forecast._compute_forecast(self))
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Proyección de horas extra'),
+            'res_model': 'hr.payslip.run.overtime.forecast',
+            'view_mode': 'list,pivot,graph',
+            'domain': [('run_id', '=', self.id)],
+            'target': 'current',
+        }
+
+
+class HrPayslipRunOvertimeForecast(models.TransientModel):
+    _name = 'hr.payslip.run.overtime.forecast'
+    _description = 'Proyección de horas extra por departamento'
+    _order = 'total_cost desc'
+
+    run_id = fields.Many2one('hr.payslip.run', string='Lote', required=True, ondelete='cascade', index=True)
+    department_id = fields.Many2one('hr.department', string='Departamento', readonly=True)
+    currency_id = fields.Many2one('res.currency', related='run_id.company_id.currency_id')
+    employee_count = fields.Integer(string='Empleados', readonly=True)
+    overtime_day_cost = fields.Monetary(string='HED', readonly=True)
+    overtime_night_cost = fields.Monetary(string='HEN', readonly=True)
+    night_surcharge_cost = fields.Monetary(string='Recargo nocturno', readonly=True)
+    guard_cost = fields.Monetary(string='Guardias', readonly=True)
+    actual_cost = fields.Monetary(string='A la fecha', readonly=True)
+    projected_cost = fields.Monetary(string='Proyección resto', readonly=True)
+    total_cost = fields.Monetary(string='Total estimado', readonly=True)
+
+    @api.model
+    def _get_hourly_rates(self, employee_ids):
+        """Valor hora por empleado según el contrato en curso (mismo criterio que worked_days)."""
+        rates = {}
+        for contract in self.env['hr.contract'].sudo().search_fetch([
+            ('employee_id', 'in', list(employee_ids)),
+            ('state', '=', 'open'),
+        ], ['employee_id', 'wage', 'hourly_wage', 'wage_type']):
+            if contract.wage_type == 'hourly':
+                rates[contract.employee_id.id] = contract.hourly_wage
+            elif contract.wage_type == 'monthly':
+                rates[contract.employee_id.id] = contract.wage / (MONTHLY_DAYS * DAILY_HOURS)
+        return rates
+
+    @api.model
+    def _compute_forecast(self, run):
+        """Devuelve los valores de las líneas del informe, una por departamento."""
+        started = perf_counter()
+        date_from = run.date_from_events
+        date_to = run.date_to_events
+        today = fields.Date.context_today(self)
+        elapsed_to = min(today, date_to)
+        remaining_days = max((date_to - elapsed_to).days, 0)
+        trailing_from = max(date_from, elapsed_to - timedelta(days=FORECAST_TRAILING_DAYS - 1))
+        trailing_days = max((elapsed_to - trailing_from).days + 1, 1)
+
+        self.env['hr.attendance'].flush_model()
+        self.env['hr.employee'].flush_model(['department_id', 'company_id'])
+        self.env.cr.execute("""
+            SELECT a.employee_id,
+                   COALESCE(e.department_id, 0),
+                   a.work_day >= %(trailing_from)s,
+                   CASE WHEN a.is_guard OR a.overtime_status = 'refused' THEN 0 ELSE COALESCE(a.overtime_day, 0) END,
+                   CASE WHEN a.is_guard OR a.overtime_status = 'refused' THEN 0 ELSE COALESCE(a.overtime_night, 0) END,
+                   COALESCE(a.night_hours, 0),
+                   COALESCE(a.guard_day_hours, 0) > 0,
+                   COALESCE(a.guard_night_hours, 0) > 0
+              FROM hr_attendance a
+              JOIN hr_employee e ON e.id = a.employee_id
+             WHERE a.work_day >= %(date_from)s
+               AND a.work_day <= %(date_to)s
+               AND e.company_id = %(company_id)s
+        """, {
+            'date_from': date_from,
+            'date_to': elapsed_to,
+            'trailing_from': trailing_from,
+            'company_id': run.company_id.id,
+        })
+        rows = self.env.cr.fetchall()
+        if not rows:
+            return []
+
+        rates = self._get_hourly_rates({row[0] for row in rows})
+        aggregate = self._aggregate_numpy if np is not None else self._aggregate_python
+        by_department = aggregate(rows, rates)
+
+        lines = []
+        for department_id, (employees, day_cost, night_cost, surcharge_cost, guard_cost, trailing_cost) in by_department.items():
+            actual = day_cost + night_cost + surcharge_cost + guard_cost
+            # Las guardias se pagan por recibo: no se proyectan
+            projected = trailing_cost / trailing_days * remaining_days
+            lines.append({
+                'run_id': run.id,
+                'department_id': department_id or False,
+                'employee_count': employees,
+                'overtime_day_cost': day_cost,
+                'overtime_night_cost': night_cost,
+                'night_surcharge_cost': surcharge_cost,
+                'guard_cost': guard_cost,
+                'actual_cost': actual,
+                'projected_cost': projected,
+                'total_cost': actual + projected,
+            })
+
+        _logger.info(
+            "Proyección de horas extra del lote %s: %s asistencias en %.2fs",
+            run.id, len(rows), perf_counter() - started,
+        )
+        return lines
+
+    @api.model
+    def _aggregate_numpy(self, rows, rates):
+        """
+        ``{departamento: (empleados, HED, HEN, recargo, guardias, costo de los
+        últimos días)}`` con columnas vectorizadas.
+        """
+        employee, department, trailing, overtime_day, overtime_night, night, guard_day, guard_night = (
+            np.array(column) for column in zip(*rows)
+        )
+        employee_ids, employee_index = np.unique(employee, return_inverse=True)
+        department_ids, department_index = np.unique(department, return_inverse=True)
+        employee_rate = np.array([rates.get(employee_id, 0.0) for employee_id in employee_ids.tolist()])
+        rate = employee_rate[employee_index]
+        size = len(department_ids)
+
+        day_cost = rate * overtime_day * OVERTIME_DAY_FACTOR
+        night_cost = rate * overtime_night * OVERTIME_NIGHT_FACTOR
+        surcharge_cost = rate * night * NIGHT_SURCHARGE_FACTOR
+        trailing_cost = np.where(trailing.astype(bool), day_cost + night_cost + surcharge_cost, 0.0)
+
+        # Guardias: una línea de 8 horas por empleado y tipo
+        employee_department = np.zeros(len(employee_ids), dtype=department_index.dtype)
+        employee_department[employee_index] = department_index
+        has_guard_day = np.bincount(employee_index, weights=guard_day.astype(float), minlength=len(employee_ids)) > 0
+        has_guard_night = np.bincount(employee_index, weights=guard_night.astype(float), minlength=len(employee_ids)) > 0
+        guard_cost = employee_rate * GUARD_PAID_HOURS * (
+            has_guard_day * GUARD_DAY_FACTOR + has_guard_night * GUARD_NIGHT_FACTOR
+        )
+
+        totals = np.vstack([
+            np.bincount(employee_department, minlength=size),
+            np.bincount(department_index, weights=day_cost, minlength=size),
+            np.bincount(department_index, weights=night_cost, minlength=size),
+            np.bincount(department_index, weights=surcharge_cost, minlength=size),
+            np.bincount(employee_department, weights=guard_cost, minlength=size),
+            np.bincount(department_index, weights=trailing_cost, minlength=size),
+        ])
+        return {
+            int(department_id): (int(totals[0, index]),) + tuple(float(value) for value in totals[1:, index])
+            for index, department_id in enumerate(department_ids.tolist())
+        }
+
+    @api.model
+    def _aggregate_python(self, rows, rates):
+        # Misma agregación que _aggregate_numpy, sin numpy
+        totals = defaultdict(lambda: [0.0] * 4)
+        employee_departments = {}
+        guards = defaultdict(lambda: [False, False])
+        for employee_id, department_id, trailing, overtime_day, overtime_night, night, guard_day, guard_night in rows:
+            rate = rates.get(employee_id, 0.0)
+            employee_departments[employee_id] = department_id
+            costs = (
+                rate * overtime_day * OVERTIME_DAY_FACTOR,
+                rate * overtime_night * OVERTIME_NIGHT_FACTOR,
+                rate * night * NIGHT_SURCHARGE_FACTOR,
+            )
+            department_totals = totals[department_id]
+            for index, cost in enumerate(costs):
+                department_totals[index] += cost
+            if trailing:
+                department_totals[3] += sum(costs)
+            guards[employee_id][0] |= guard_day
+            guards[employee_id][1] |= guard_night
+
+        employee_counts = defaultdict(int)
+        guard_costs = defaultdict(float)
+        for employee_id, department_id in employee_departments.items():
+            employee_counts[department_id] += 1
+            has_guard_day, has_guard_night = guards[employee_id]
+            guard_costs[department_id] += rates.get(employee_id, 0.0) * GUARD_PAID_HOURS * (
+                has_guard_day * GUARD_DAY_FACTOR + has_guard_night * GUARD_NIGHT_FACTOR
+            )
+        return {
+            department_id: (employee_counts[department_id], day, night, surcharge, guard_costs[department_id], trailing)
+            for department_id, (day, night, surcharge, trailing) in totals.items()
+        }
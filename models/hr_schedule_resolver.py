@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+from odoo import models, api, tools
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import datetime, time
+from itertools import accumulate
+import pytz
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Periodo de la línea de tiempo (UTC naive, límites inclusivos)
+SchedulePeriod = namedtuple('SchedulePeriod', ['start', 'stop', 'calendar_id', 'res_id', 'state'])
+
+
+class ScheduleTimeline:
+    """Periodos ordenados por inicio, consultados por bisección."""
+
+    __slots__ = ('starts', 'stops', 'max_stops', 'periods')
+
+    def __init__(self, periods):
+        periods = sorted(periods, key=lambda p: p.start)
+        self.periods = periods
+        self.starts = [p.start for p in periods]
+        self.stops = [p.stop for p in periods]
+        # Máximo acumulado de los fines: permite cortar la búsqueda hacia atrás
+        self.max_stops = list(accumulate(self.stops, max))
+
+    def overlapping(self, start, stop):
+        """Periodos que se solapan con [start, stop], del más reciente al más antiguo."""
+        index = bisect_right(self.starts, stop) - 1
+        while index >= 0 and self.max_stops[index] >= start:
+            if self.stops[index] >= start:
+                yield self.periods[index]
+            index -= 1
+
+    def at(self, instant):
+        return next(self.overlapping(instant, instant), None)
+
+
+class HrScheduleResolver(models.AbstractModel):
+    _name = 'hr.schedule.resolver'
+    _description = 'Resolución de horario efectivo'
+
+    # -------------------------------
+    # Caché de líneas de tiempo
+    # -------------------------------
+
+    @tools.ormcache()
+    def _get_timeline_store(self):
+        # Contenedor por proceso; registry.clear_cache() lo descarta en todos los workers
+        return {}
+
+    @api.model
+    def _invalidate_timelines(self):
+        self.env.registry.clear_cache()
+
+    @api.model
+    def _get_timelines(self, employee_ids):
+        """
+        Devuelve ``{employee_id: (contratos, cambios_de_turno)}`` como
+        ``ScheduleTimeline``. Los empleados que no están en caché se cargan
+        con una búsqueda por modelo para todo el grupo.
+        """
+        store = self._get_timeline_store()
+        missing = [employee_id for employee_id in set(employee_ids) if employee_id and employee_id not in store]
+        if missing:
+            contract_periods = {employee_id: [] for employee_id in missing}
+            for contract in self.env['hr.contract'].sudo().search_fetch([
+                ('employee_id', 'in', missing),
+                ('state', 'in', ['open', 'close']),
+            ], ['employee_id', 'date_start', 'date_end', 'resource_calendar_id', 'state']):
+                contract_periods[contract.employee_id.id].append(SchedulePeriod(
+                    datetime.combine(contract.date_start, time.min),
+                    datetime.combine(contract.date_end, time.max) if contract.date_end else datetime.max,
+                    contract.resource_calendar_id.id,
+                    contract.id,
+                    contract.state,
+                ))
+
+            shift_periods = {employee_id: [] for employee_id in missing}
+            for shift_change in self.env['hr.employee.shift.change'].sudo().search_fetch([
+                ('employee_id', 'in', missing),
+                ('state', '=', 'approved'),
+            ], ['employee_id', 'date_start', 'date_end', 'calendar_id', 'state']):
+                shift_periods[shift_change.employee_id.id].append(SchedulePeriod(
+                    shift_change.date_start,
+                    shift_change.date_end,
+                    shift_change.calendar_id.id,
+                    shift_change.id,
+                    shift_change.state,
+                ))
+
+            for employee_id in missing:
+                store[employee_id] = (
+                    ScheduleTimeline(contract_periods[employee_id]),
+                    ScheduleTimeline(shift_periods[employee_id]),
+                )
+        return {employee_id: store[employee_id] for employee_id in employee_ids if employee_id in store}
+
+    def _get_timeline(self, employee_id):
+        return self._get_timelines([employee_id]).get(employee_id) or (ScheduleTimeline([]), ScheduleTimeline([]))
+
+    # -------------------------------
+    # Consultas
+    # -------------------------------
+
+    @api.model
+    def _get_contract_at(self, employee_id, instant, states=('open', 'close')):
+        """Contrato vigente en ``instant`` (UTC naive) o ``None``."""
+        contracts, dummy = self._get_timeline(employee_id)
+        return next((
+            period for period in contracts.overlapping(instant, instant)
+            if period.state in states
+        ), None)
+
+    @api.model
+    def _get_shift_changes(self, employee_id, start, stop):
+        """Cambios de turno aprobados que se solapan con [start, stop], el más reciente primero."""
+        dummy, shifts = self._get_timeline(employee_id)
+        return list(shifts.overlapping(start, stop))
+
+    @api.model
+    def _get_day_shift_change(self, employee_id, day):
+        """
+        Cambio de turno aprobado más reciente que rige el día local ``day``.
+        Se compara la fecha (UTC) de inicio y fin del cambio con ``day``, como
+        hace la asignación del horario de las asistencias desde siempre.
+        """
+        shift_changes = self._get_shift_changes(
+            employee_id,
+            datetime.combine(day, time.min),
+            datetime.combine(day, time.max),
+        )
+        return shift_changes[0] if shift_changes else None
+
+    @api.model
+    def _get_day_schedule(self, employee, day):
+        """
+        ``(calendar_id, shift_change_id)`` efectivos del empleado para el día
+        local ``day``; ``shift_change_id`` es False si rige el contrato o el
+        calendario del empleado.
+        """
+        tz = pytz.timezone(employee.tz or 'UTC')
+        day_start = tz.localize(datetime.combine(day, time.min)).astimezone(pytz.UTC).replace(tzinfo=None)
+        shift_change = self._get_day_shift_change(employee.id, day)
+        if shift_change:
+            return shift_change.calendar_id, shift_change.res_id
+        contract = self._get_contract_at(employee.id, day_start)
+        return (contract and contract.calendar_id) or employee.resource_calendar_id.id, False
+
+    @api.model
+    def _get_day_calendar(self, employee, day):
+        """Calendario efectivo del empleado para el día local ``day``."""
+        calendar_id, dummy = self._get_day_schedule(employee, day)
+        return self.env['resource.calendar'].browse(calendar_id)
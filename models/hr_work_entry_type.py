@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from odoo import models, api, tools
+from odoo.tools import frozendict
+
+
+class HrWorkEntryType(models.Model):
+    _inherit = 'hr.work.entry.type'
+
+    @tools.ormcache()
+    def _get_code_registry(self):
+        """
+        ``(código -> id, ids de ausencia)`` de los tipos de entrada activos. Se
+        guarda en la caché del registro y se vacía (en todos los workers) al
+        crear, modificar o eliminar tipos.
+        """
+        ids_by_code = {}
+        leave_ids = set()
+        for work_entry_type in self.sudo().search_fetch([], ['code', 'is_leave']):
+            if work_entry_type.code:
+                # Igual que search(limit=1): el primero según el orden del modelo
+                ids_by_code.setdefault(work_entry_type.code, work_entry_type.id)
+            if work_entry_type.is_leave:
+                leave_ids.add(work_entry_type.id)
+        return frozendict(ids_by_code), frozenset(leave_ids)
+
+    @api.model
+    def _get_by_code(self, code):
+        """Tipo de entrada con el código dado (vacío si no existe)."""
+        ids_by_code, dummy = self._get_code_registry()
+        return self.browse(ids_by_code.get(code, ()))
+
+    @api.model
+    def _get_leave_types(self):
+        dummy, leave_ids = self._get_code_registry()
+        return self.browse(sorted(leave_ids))
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
@@ -13,6 +13,29 @@ class ResCompany(models.Model):
         string="Minutos para considerar llegada tarde",
         default=10.0
     )
+    attendance_shift_merge_tolerance = fields.Integer(
+        string="Tolerancia entre bloques de un turno (minutos)",
+        default=90
+    )
+    attendance_fast_check_in = fields.Boolean(
+        string="Marcación rápida"
+    )
+    attendance_track_recomputes = fields.Boolean(
+        string="Seguimiento de recálculos de asistencias"
+    )
+    overtime_daily_cap = fields.Float(
+        string="Máximo de horas extra por día",
+        default=3.0
+    )
+    overtime_weekly_cap = fields.Float(
+        string="Máximo de horas extra por semana",
+        default=9.0
+    )
+    overtime_cap_policy = fields.Selection([
+        ('none', 'No controlar'),
+        ('flag', 'Marcar'),
+        ('block', 'Bloquear aprobación'),
+    ], string="Control de máximos de horas extra", default='none', required=True)
 
 class ResConfigSettings(models.TransientModel):
     _inherit = 'res.config.settings'
@@ -22,4 +45,41 @@ class ResConfigSettings(models.TransientModel):
         related='company_id.attendance_late_threshold_minutes',
         readonly=False,
         help="Cantidad de minutos de tolerancia antes de marcar una asistencia como 'llegada tarde'."
-    )
\ No newline at end of file
+    )
+    attendance_shift_merge_tolerance = fields.Integer(
+        string="Tolerancia entre bloques de un turno (minutos)",
+        related='company_id.attendance_shift_merge_tolerance',
+        readonly=False,
+        help="Bloques del horario separados por a lo sumo estos minutos se consideran un mismo turno."
+    )
+    attendance_fast_check_in = fields.Boolean(
+        string="Marcación rápida",
+        related='company_id.attendance_fast_check_in',
+        readonly=False,
+        help="Las marcaciones del kiosco y la aplicación se guardan de inmediato y "
+             "el horario, retrasos y horas extra se calculan segundos después."
+    )
+    attendance_track_recomputes = fields.Boolean(
+        string="Seguimiento de recálculos de asistencias",
+        related='company_id.attendance_track_recomputes',
+        readonly=False,
+        help="Registra en el historial de cada asistencia los cambios producidos por "
+             "recálculos automáticos. Las ediciones manuales siempre se registran."
+    )
+    overtime_daily_cap = fields.Float(
+        string="Máximo de horas extra por día",
+        related='company_id.overtime_daily_cap',
+        readonly=False
+    )
+    overtime_weekly_cap = fields.Float(
+        string="Máximo de horas extra por semana",
+        related='company_id.overtime_weekly_cap',
+        readonly=False
+    )
+    overtime_cap_policy = fields.Selection(
+        string="Control de máximos de horas extra",
+        related='company_id.overtime_cap_policy',
+        readonly=False,
+        help="Marcar: se señalan las horas extra que superan el máximo. "
+             "Bloquear: además no se permite aprobarlas."
+    )
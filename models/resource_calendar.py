@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, tools
+from odoo.addons.resource.models.utils import Intervals
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta
+import pytz
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Campos del calendario que cambian los turnos resueltos en caché
+CALENDAR_SCHEDULE_FIELDS = {'tz', 'attendance_ids', 'two_weeks_calendar', 'flexible_hours'}
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+# Los bloques que empiezan antes de las 04:00 del día de la marcación
+# pertenecen al turno del día anterior
+SHIFT_DAY_CUTOFF_MINUTES = 4 * 60
+
+
+class WeekShiftTable:
+    """
+    Bloques de trabajo de un calendario semanal en minutos desde el lunes
+    00:00 local, repetidos en dos semanas para cubrir las ventanas que cruzan
+    el domingo. ``chain_ends[i]`` es el fin del turno que empieza en el
+    bloque ``i`` tras unir los bloques separados por a lo sumo ``tolerance``.
+    """
+
+    __slots__ = ('starts', 'stops', 'chain_ends', 'tolerance')
+
+    def __init__(self, blocks, tolerance):
+        merged = []
+        for start, stop in sorted(blocks + [(start + MINUTES_PER_WEEK, stop + MINUTES_PER_WEEK) for start, stop in blocks]):
+            # Igual que Intervals: los bloques contiguos o solapados se unen
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], stop)
+            else:
+                merged.append([start, stop])
+        self.starts = [start for start, dummy in merged]
+        self.stops = [stop for dummy, stop in merged]
+        self.tolerance = tolerance
+
+        chain_ends = list(self.stops)
+        for index in range(len(merged) - 2, -1, -1):
+            if self.starts[index + 1] - self.stops[index] <= tolerance:
+                chain_ends[index] = chain_ends[index + 1]
+        self.chain_ends = chain_ends
+
+    def lookup(self, minute, day_offset):
+        """
+        Turno de una marcación en ``minute`` (minutos desde el lunes) para el
+        día que empieza en ``day_offset``: ``(inicio, fin)`` en minutos o None.
+        Mismo criterio que ``hr.attendance._match_scheduled_interval``.
+        """
+        window_end = day_offset + 2 * MINUTES_PER_DAY
+        first = bisect_left(self.starts, day_offset + SHIFT_DAY_CUTOFF_MINUTES)
+        last = bisect_left(self.starts, window_end)
+        if first >= last:
+            return None
+
+        index = bisect_right(self.starts, minute) - 1
+        if index < first or self.stops[index] < minute:
+            index = first
+
+        end = self.chain_ends[index]
+        if end > window_end:
+            # La cadena sale de la ventana: recorrerla bloque a bloque
+            end = self.stops[index]
+            for next_index in range(index + 1, last):
+                if self.starts[next_index] - end > self.tolerance:
+                    break
+                end = self.stops[next_index]
+            end = min(end, window_end)
+        return self.starts[index], end
+
+
+class ResourceCalendar(models.Model):
+    _inherit = 'resource.calendar'
+
+    def write(self, vals):
+        res = super().write(vals)
+        # Turnos esperados (kiosco/portal) y tablas de turnos en caché
+        if CALENDAR_SCHEDULE_FIELDS.intersection(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    @tools.ormcache('self.id', 'write_date', 'tz_name', 'week_start', 'lunch')
+    def _get_week_attendance_intervals(self, write_date, tz_name, week_start, lunch):
+        """
+        Intervalos de asistencia, independientes del recurso, de la semana local
+        que empieza el lunes ``week_start``. Se guardan en la caché LRU del
+        registro: la clave incluye write_date del calendario y los cambios en
+        sus líneas vacían la caché en todos los workers.
+        """
+        tz = pytz.timezone(tz_name)
+        start = tz.localize(datetime.combine(week_start, time.min))
+        stop = tz.localize(datetime.combine(week_start + timedelta(days=7), time.min))
+        intervals = self._attendance_intervals_batch(start, stop, tz=tz, lunch=lunch)[False]
+        return tuple((interval_start, interval_stop, tuple(attendances.ids)) for interval_start, interval_stop, attendances in intervals)
+
+    def _get_shift_table(self, tolerance):
+        """
+        Tabla semanal compilada de turnos (``WeekShiftTable``) o None si el
+        calendario no se puede representar como una semana fija.
+        """
+        self.ensure_one()
+        return self._get_week_shift_table(self.write_date, tolerance)
+
+    @tools.ormcache('self.id', 'write_date', 'tolerance')
+    def _get_week_shift_table(self, write_date, tolerance):
+        # Calendarios de dos semanas, flexibles o con líneas con vigencia: usar intervalos
+        if self.two_weeks_calendar or self.flexible_hours:
+            return None
+        lines = self.attendance_ids.filtered(
+            lambda line: not line.display_type and not line.resource_id and line.day_period != 'lunch'
+        )
+        if any(line.date_from or line.date_to for line in lines):
+            return None
+        blocks = [
+            (
+                int(line.dayofweek) * MINUTES_PER_DAY + round(line.hour_from * 60),
+                int(line.dayofweek) * MINUTES_PER_DAY + round(line.hour_to * 60),
+            )
+            for line in lines
+        ]
+        return WeekShiftTable(blocks, tolerance)
+
+    def _get_day_shift_blocks(self, day, tz, tolerance, resource=None):
+        """
+        Turnos que empiezan el día local ``day`` como ``(inicio, fin)`` en hora
+        local naive, con los bloques cercanos ya unidos.
+        """
+        self.ensure_one()
+        day_start = datetime.combine(day, time.min)
+        table = self._get_shift_table(tolerance)
+        if table is not None:
+            day_offset = day.weekday() * MINUTES_PER_DAY
+            first = bisect_left(table.starts, day_offset)
+            last = bisect_left(table.starts, day_offset + MINUTES_PER_DAY)
+            blocks = []
+            for index in range(first, last):
+                # Bloques ya incluidos en el turno anterior
+                if blocks and table.starts[index] - day_offset <= (blocks[-1][1] - day_start).total_seconds() / 60:
+                    continue
+                blocks.append((
+                    day_start + timedelta(minutes=table.starts[index] - day_offset),
+                    day_start + timedelta(minutes=table.chain_ends[index] - day_offset),
+                ))
+            return blocks
+
+        # Calendarios no compilables: intervalos del día siguiente incluidos para unir turnos nocturnos
+        start = tz.localize(day_start)
+        stop = tz.localize(day_start + timedelta(days=2))
+        intervals = self._cached_attendance_intervals_batch(start, stop, resource)[resource.id if resource else False]
+        blocks = []
+        for interval_start, interval_stop, dummy in intervals:
+            interval_start = interval_start.astimezone(tz).replace(tzinfo=None)
+            interval_stop = interval_stop.astimezone(tz).replace(tzinfo=None)
+            if blocks and (interval_start - blocks[-1][1]) <= timedelta(minutes=tolerance):
+                blocks[-1] = (blocks[-1][0], interval_stop)
+            elif interval_start < day_start + timedelta(days=1):
+                blocks.append((interval_start, interval_stop))
+            else:
+                break
+        return blocks
+
+    def _cached_attendance_intervals_batch(self, start_dt, end_dt, resources=None, lunch=False):
+        """
+        Igual que ``_attendance_intervals_batch`` (sin ``domain``) pero armado a
+        partir de las semanas en caché; devuelve ``{resource_id: Intervals}``
+        incluyendo la clave False. Se ignoran las líneas específicas de recurso.
+        """
+        self.ensure_one()
+        assert start_dt.tzinfo and end_dt.tzinfo
+        CalendarAttendance = self.env['resource.calendar.attendance']
+        resources_list = list(resources or []) + [self.env['resource.resource']]
+        write_date = self.write_date
+
+        intervals_by_tz = {}
+        result = {}
+        for resource in resources_list:
+            tz_name = (resource or self).tz or 'UTC'
+            if tz_name not in intervals_by_tz:
+                tz = pytz.timezone(tz_name)
+                local_start = start_dt.astimezone(tz)
+                local_end = end_dt.astimezone(tz)
+
+                items = []
+                week_start = local_start.date() - timedelta(days=local_start.weekday())
+                while week_start <= local_end.date():
+                    for interval_start, interval_stop, attendance_ids in self._get_week_attendance_intervals(
+                        write_date, tz_name, week_start, lunch
+                    ):
+                        items.append((interval_start, interval_stop, CalendarAttendance.browse(attendance_ids)))
+                    week_start += timedelta(days=7)
+
+                # Intervals une los bloques contiguos entre semanas; luego se recorta al rango
+                intervals_by_tz[tz_name] = Intervals(items) & Intervals([(start_dt, end_dt, CalendarAttendance)])
+            result[resource.id] = intervals_by_tz[tz_name]
+        return result
+
+
+class ResourceCalendarAttendance(models.Model):
+    _inherit = 'resource.calendar.attendance'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
@@ -197,6 +197,14 @@ class HrLeave(models.Model):
     def action_refuse(self):
         res = super().action_refuse()
     
+        # Los cambios de turno ya no están en las dependencias de las asistencias:
+        # si el permiso rechazado los dejara aprobados, su horario seguiría
+        # vigente. Cancelarlos encola el recálculo acotado a su rango.
+        self.env['hr.employee.shift.change'].search([
+            ('leave_id', 'in', self.ids),
+            ('state', '=', 'approved'),
+        ]).write({'state': 'cancelled'})
+
         for leave in self:
             if leave.holiday_status_id.shift_change:
                 leave.employee_id.write({
@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 #Calcula el monto a pagar en las lineas de nomina
 from odoo import models,api
+from .hr_contract import (
+    MONTHLY_DAYS, DAILY_HOURS, OVERTIME_DAY_FACTOR, OVERTIME_NIGHT_FACTOR,
+    NIGHT_SURCHARGE_FACTOR, GUARD_DAY_FACTOR, GUARD_NIGHT_FACTOR, GUARD_PAID_HOURS,
+)
 import logging
 
 _logger = logging.getLogger(__name__)
@@ -11,16 +15,16 @@ class HrPayslipWorkedDays(models.Model):
     def _compute_amount(self):
         # === Tipos de entrada especiales ===
         _logger.info("Compute amount!!!!!")
-        overtime_day_type = self.env['hr.work.entry.type'].search([('code', '=', 'OVERTIME_EVENING')], limit=1)
-        overtime_night_type = self.env['hr.work.entry.type'].search([('code', '=', 'OVERTIME_NIGHT')], limit=1)
-        guard_day_type = self.env['hr.work.entry.type'].search([('code', '=', 'GUARD_EVENING')], limit=1)
-        guard_night_type = self.env['hr.work.entry.type'].search([('code', '=', 'GUARD_NIGHT')], limit=1)
-        recargo_nocturno_type = self.env['hr.work.entry.type'].search([('code', '=', 'RECARGON')], limit=1) 
-        regular_work_type = self.env['hr.work.entry.type'].search([('code', '=', 'WORK100')], limit=1)
-        late_type = self.env['hr.work.entry.type'].search([('code', '=', 'LATE')], limit=1)
-        leave_types = self.env['hr.work.entry.type'].search([('is_leave', '=', True)])
-        off_days_type= self.env['hr.work.entry.type'].search([('code', '=', 'UNJUSTIFIED')], limit=1)
-        liquidation_days_type = self.env['hr.work.entry.type'].search([('code', '=', 'VACACIONESL')], limit=1)
+        overtime_day_type = self.env['hr.work.entry.type']._get_by_code('OVERTIME_EVENING')
+        overtime_night_type = self.env['hr.work.entry.type']._get_by_code('OVERTIME_NIGHT')
+        guard_day_type = self.env['hr.work.entry.type']._get_by_code('GUARD_EVENING')
+        guard_night_type = self.env['hr.work.entry.type']._get_by_code('GUARD_NIGHT')
+        recargo_nocturno_type = self.env['hr.work.entry.type']._get_by_code('RECARGON') 
+        regular_work_type = self.env['hr.work.entry.type']._get_by_code('WORK100')
+        late_type = self.env['hr.work.entry.type']._get_by_code('LATE')
+        leave_types = self.env['hr.work.entry.type']._get_leave_types()
+        off_days_type= self.env['hr.work.entry.type']._get_by_code('UNJUSTIFIED')
+        liquidation_days_type = self.env['hr.work.entry.type']._get_by_code('VACACIONESL')
         # Estructuras a excluir (ej. US)
         us_structures = self.env['hr.payroll.structure'].search([('code', '=', 'USMONTHLY')])
 
@@ -89,9 +93,7 @@ class HrPayslipWorkedDays(models.Model):
                 hourly_rate = contract.hourly_wage
             elif wd.payslip_id.wage_type == 'monthly':
                 # Suponemos 30 días y 8 horas diarias
-                daily_hours = 8  # Ajusta si tu regla es distinta
-                monthly_days = 30
-                total_monthly_hours = monthly_days * daily_hours
+                total_monthly_hours = MONTHLY_DAYS * DAILY_HOURS
                 hourly_rate = contract.wage / total_monthly_hours
             else:
                 # Otros casos, usar el cálculo por defecto
@@ -101,26 +103,26 @@ class HrPayslipWorkedDays(models.Model):
             amount = 0.0
             if wd.work_entry_type_id == overtime_day_type:
                 # HED = SH * 1.5
-                rate = hourly_rate * 1.5
+                rate = hourly_rate * OVERTIME_DAY_FACTOR
                 amount = rate * hours
 
             elif wd.work_entry_type_id == overtime_night_type:
                 # HEN = (SH + 30% recargo) * 2 → SH * 1.3 * 2 = SH * 2.6
-                rate = hourly_rate * 2.0
+                rate = hourly_rate * OVERTIME_NIGHT_FACTOR
                 amount = rate * hours
 
             elif wd.work_entry_type_id == guard_day_type:
                 # GD = 8 horas a tasa de HED (1.5)
-                rate = hourly_rate * 1.5
-                amount = rate * 8.0  # Guardia diurna: pago fijo por 8 horas
+                rate = hourly_rate * GUARD_DAY_FACTOR
+                amount = rate * GUARD_PAID_HOURS  # Guardia diurna: pago fijo por 8 horas
 
             elif wd.work_entry_type_id == guard_night_type:
                 # GN = 8 horas a tasa de HEN (2.6)
-                rate = hourly_rate * 2.6
-                amount = rate * 8.0  # Guardia nocturna: pago fijo por 8 horas
+                rate = hourly_rate * GUARD_NIGHT_FACTOR
+                amount = rate * GUARD_PAID_HOURS  # Guardia nocturna: pago fijo por 8 horas
             elif wd.work_entry_type_id == recargo_nocturno_type:  # ← NUEVO
                 # RECARGO NOCTURNO = SH * 0.30
-                amount = hourly_rate * 0.30 * hours
+                amount = hourly_rate * NIGHT_SURCHARGE_FACTOR * hours
             elif wd.work_entry_type_id == off_days_type:
                 contract = wd.payslip_id.contract_id
                 days = wd.number_of_days  # ¡Importante! Usar días, no horas
@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+from . import test_attendance_fast_check_in
+from . import test_attendance_night_hours
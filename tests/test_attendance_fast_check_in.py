@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+
+from odoo.addons.hr_holiday_attendance_views.models.hr_attendance import HrContract as HrAttendance
+from odoo.addons.hr_holiday_attendance_views.models.hr_schedule_resolver import HrScheduleResolver
+
+
+@tagged('post_install', '-at_install')
+class TestAttendanceFastCheckIn(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env.company.attendance_fast_check_in = True
+        cls.employee = cls.env['hr.employee'].create({
+            'name': 'Marcación rápida',
+            'company_id': cls.env.company.id,
+            'tz': 'America/Asuncion',
+        })
+
+    def test_fast_check_in_skips_schedule_lookups(self):
+        # Ni el pipeline de asistencia ni el resolvedor de horarios deben ejecutarse al marcar
+        with patch.object(HrAttendance, '_get_scheduled_attendance_times', autospec=True, return_value={}) as schedule_lookup, \
+                patch.object(HrScheduleResolver, '_get_timelines', autospec=True, return_value={}) as timeline_lookup:
+            self.employee._attendance_action_change()
+            self.env.flush_all()
+
+        schedule_lookup.assert_not_called()
+        timeline_lookup.assert_not_called()
+        attendance = self.employee.last_attendance_id
+        self.assertTrue(attendance.computation_pending)
+        self.assertFalse(attendance.work_day)
+
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+from unittest import skipIf
+
+from pytz import timezone, UTC
+
+from odoo.tests import TransactionCase, tagged
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+@skipIf(np is None, "numpy no está instalado")
+@tagged('post_install', '-at_install')
+class TestAttendanceNightHours(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.employee_py = cls.env['hr.employee'].create({
+            'name': 'Recargo nocturno Asunción',
+            'tz': 'America/Asuncion',
+        })
+        cls.employee_es = cls.env['hr.employee'].create({
+            'name': 'Recargo nocturno Madrid',
+            'tz': 'Europe/Madrid',
+        })
+
+    def _create_attendance(self, employee, local_start, local_end):
+        tz = timezone(employee.tz)
+        return self.env['hr.attendance'].create({
+            'employee_id': employee.id,
+            'check_in': tz.localize(local_start).astimezone(UTC).replace(tzinfo=None),
+            'check_out': tz.localize(local_end).astimezone(UTC).replace(tzinfo=None),
+        })
+
+    def _night_hours_by_path(self, attendances):
+        attendances._compute_night_hours_single()
+        single = {att: att.night_hours for att in attendances}
+        # Valor imposible para que no pase una asistencia que el lote no asigne
+        attendances.night_hours = -1.0
+        computed = attendances._compute_night_hours_bulk()
+        bulk = {att: att.night_hours for att in computed}
+        return single, bulk, computed
+
+    def test_bulk_matches_single(self):
+        # Junio y julio de 2023: Asunción sin cambio de horario
+        Attendance = self.env['hr.attendance']
+        band_end = self._create_attendance(
+            self.employee_py, datetime(2023, 6, 1, 21, 0), datetime(2023, 6, 1, 23, 59, 59))
+        to_midnight = self._create_attendance(
+            self.employee_py, datetime(2023, 6, 2, 21, 0), datetime(2023, 6, 3, 0, 0))
+        across_midnight = self._create_attendance(
+            self.employee_py, datetime(2023, 6, 3, 22, 0), datetime(2023, 6, 4, 7, 0))
+        # Jornadas de 9 h que empiezan a distintas horas del día (hasta julio)
+        varied = Attendance
+        for offset in range(20):
+            start = datetime(2023, 6, 5, (offset * 5) % 24, (offset * 7) % 60) + timedelta(days=2 * offset)
+            varied |= self._create_attendance(self.employee_py, start, start + timedelta(hours=9))
+
+        attendances = band_end | to_midnight | across_midnight | varied
+        single, bulk, computed = self._night_hours_by_path(attendances)
+
+        self.assertEqual(computed, attendances)
+        for att in attendances:
+            self.assertAlmostEqual(bulk[att], single[att], places=6, msg=att.check_in)
+        # 21:00 a 23:59:59 y 21:00 a 00:00: la franja termina a las 23:59:59
+        self.assertAlmostEqual(single[band_end], (3 * 3600 - 1) / 3600.0, places=6)
+        self.assertAlmostEqual(single[to_midnight], (3 * 3600 - 1) / 3600.0, places=6)
+        # 22:00 a 07:00: 1:59:59 antes de medianoche y 6 h después
+        self.assertAlmostEqual(single[across_midnight], (8 * 3600 - 1) / 3600.0, places=6)
+
+    def test_dst_change_falls_back_to_single(self):
+        # 31/03/2024 02:00 en Madrid pasa a 03:00: la noche dura una hora menos
+        dst_night = self._create_attendance(
+            self.employee_es, datetime(2024, 3, 30, 22, 0), datetime(2024, 3, 31, 7, 0))
+        regular_night = self._create_attendance(
+            self.employee_es, datetime(2024, 3, 28, 22, 0), datetime(2024, 3, 29, 7, 0))
+        attendances = dst_night | regular_night
+
+        single, bulk, computed = self._night_hours_by_path(attendances)
+        self.assertEqual(computed, regular_night)
+        self.assertAlmostEqual(bulk[regular_night], single[regular_night], places=6)
+
+        # El cálculo completo resuelve la asistencia con DST por registro
+        attendances._compute_night_hours()
+        self.assertAlmostEqual(dst_night.night_hours, single[dst_night], places=6)
+        self.assertAlmostEqual(regular_night.night_hours, single[regular_night], places=6)